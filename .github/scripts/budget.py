@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+import os
+import time
+
+
+# Environment variables used to hand the run deadline to stage scripts
+RUN_DEADLINE_ENV = 'HA_RUN_DEADLINE'
+STAGE_DEADLINE_ENV = 'HA_STAGE_DEADLINE'
+
+# Below this many seconds a new external call is not worth starting
+MIN_CALL_SECONDS = 1.0
+
+# Prefix of the per-service result lines healthcheck.py prints as it goes, so
+# main.py can still use the completed checks if the stage has to be killed
+PARTIAL_RESULT_PREFIX = 'HA-PARTIAL-RESULT '
+
+
+class BudgetExhausted(Exception):
+    """Raised when there is no time left to start another external call"""
+
+
+class RunBudget:
+    """Deadline-aware time budget for one monitor run.
+
+    The total budget is split across stages by share. A stage's deadline is
+    the run deadline minus the time reserved for the stages after it, so
+    time left over by a fast stage rolls forward to the next one.
+    """
+
+    def __init__(self, run_deadline, stage_shares, total, stage_deadline=None):
+        self.run_deadline = run_deadline
+        self.stage_shares = stage_shares
+        self.total = total
+        self.stage_deadline = stage_deadline
+
+    @classmethod
+    def from_config(cls, config, start=None):
+        """Start a new budget from the run_budget config section"""
+        budget_config = config['run_budget']
+        start = time.time() if start is None else start
+        return cls(start + budget_config['total_seconds'], budget_config['stages'],
+                   budget_config['total_seconds'])
+
+    @classmethod
+    def from_env(cls, config, stage):
+        """Resume the budget handed down by main.py, or start a new one"""
+        budget = cls.from_config(config)
+        if os.environ.get(RUN_DEADLINE_ENV):
+            budget.run_deadline = float(os.environ[RUN_DEADLINE_ENV])
+        if os.environ.get(STAGE_DEADLINE_ENV):
+            budget.stage_deadline = float(os.environ[STAGE_DEADLINE_ENV])
+        else:
+            budget.start_stage(stage)
+        return budget
+
+    def deadline_for(self, stage):
+        """Deadline for a stage, reserving time for the stages after it.
+
+        Stages without a share (e.g. background ones) may use the whole run.
+        """
+        names = list(self.stage_shares)
+        later = names[names.index(stage) + 1:] if stage in names else []
+        reserved = sum(self.stage_shares[name] for name in later) * self.total
+        return self.run_deadline - reserved
+
+    def start_stage(self, stage):
+        """Make the given stage's deadline the current one"""
+        self.stage_deadline = self.deadline_for(stage)
+        return self.stage_deadline
+
+    def remaining(self):
+        """Seconds left in the current stage (or the run, outside a stage)"""
+        deadline = self.run_deadline
+        if self.stage_deadline is not None:
+            deadline = min(deadline, self.stage_deadline)
+        return max(0.0, deadline - time.time())
+
+    def timeout(self, cap):
+        """Timeout for the next external call: at most cap, never past the deadline"""
+        remaining = self.remaining()
+        if remaining < MIN_CALL_SECONDS:
+            raise BudgetExhausted(f"run budget exhausted ({remaining:.1f}s left)")
+        return min(cap, remaining)
+
+    def env(self, stage):
+        """Environment for a stage subprocess, carrying the deadlines"""
+        env = dict(os.environ)
+        env[RUN_DEADLINE_ENV] = repr(self.run_deadline)
+        env[STAGE_DEADLINE_ENV] = repr(self.deadline_for(stage))
+        return env
+
+
+def call_timeout(budget, cap):
+    """Timeout for the next external call, bounded by the budget if there is one"""
+    return budget.timeout(cap) if budget else cap
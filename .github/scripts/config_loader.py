@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+import os
+import re
+import json
+import hashlib
+import tempfile
+
+
+CONFIG_PATH = '.github/ha-monitor-config.json'
+
+# Per-server and per-service fragment files merged into the base config,
+# e.g. .github/ha/servers/server-01.json
+FRAGMENT_DIR = '.github/ha'
+FRAGMENT_KINDS = ('servers', 'services')
+
+# Names that can be used as fragment file names: no path separators or leading dot
+FRAGMENT_NAME_PATTERN = re.compile(r'[A-Za-z0-9_-][A-Za-z0-9._-]*')
+
+# Bump when the normalized layout changes so stale cache files are ignored
+COMPILED_VERSION = 7
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_TTL = 120
+DEFAULT_PROXIED = False
+
+DEFAULT_TLS = {
+    'expiry_warn_days': 14,
+    'expiry_fail_days': 0,
+    'hostname_mismatch': 'degraded',
+    'min_version': 'TLSv1.2',
+    'max_handshake_ms': None
+}
+# Oldest first; also used to compare the protocol a server negotiated
+TLS_VERSIONS = ('SSLv3', 'TLSv1', 'TLSv1.1', 'TLSv1.2', 'TLSv1.3')
+
+DEFAULT_DASHBOARD = {
+    'outputs': ['markdown', 'json', 'html'],
+    'markdown_path': 'README.md',
+    'json_path': 'status.json',
+    'html_path': 'status.html'
+}
+
+DEFAULT_NOTIFICATIONS = {
+    'cooldown_minutes': 30,
+    'timeout_seconds': 10,
+    'state_path': '.ha-state/notify-state.json',
+    'sinks': []
+}
+
+# Required fields for each notification sink type
+NOTIFICATION_SINK_FIELDS = {
+    'webhook': (),
+    'email': ('from', 'to'),
+    'file': ('path',)
+}
+
+# Pipeline stages in run order with their default share of the run budget
+DEFAULT_RUN_BUDGET = {
+    'total_seconds': 240,
+    'stages': {
+        'healthcheck': 0.5,
+        'dns': 0.25,
+        'logging': 0.1,
+        'dashboard': 0.15
+    }
+}
+
+# In-process cache of compiled configs keyed by file hash
+_compiled_cache = {}
+
+
+class ConfigError(Exception):
+    """Raised when the monitor configuration is invalid"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('\n'.join(f"   - {error}" for error in errors))
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _check_type(errors, where, value, expected, type_name):
+    if expected is int:
+        ok = _is_int(value)
+    elif expected is float:
+        ok = (_is_int(value) or isinstance(value, float))
+    else:
+        ok = isinstance(value, expected)
+    if not ok:
+        errors.append(f"{where} must be {type_name}, got {type(value).__name__}")
+    return ok
+
+
+def _validate_section(errors, config, name):
+    section = config.get(name)
+    if section is None:
+        errors.append(f"'{name}' section is required")
+        return {}
+    if not _check_type(errors, name, section, dict, 'an object'):
+        return {}
+    _check_type(errors, f"{name}.enabled", section.get('enabled'), bool, 'a boolean')
+    return section
+
+
+def _compile_servers(errors, config):
+    """Validate server definitions and return them indexed by name"""
+    servers = config.get('servers', [])
+    if not isinstance(servers, list):
+        errors.append("'servers' must be a list")
+        return [], {}
+
+    compiled = []
+    by_name = {}
+    for index, server in enumerate(servers):
+        where = f"servers[{index}]"
+        if not _check_type(errors, where, server, dict, 'an object'):
+            continue
+        name = server.get('name')
+        if not isinstance(name, str) or not name:
+            errors.append(f"{where}.name is required")
+            continue
+        where = f"servers[{index}] ({name})"
+        if name in by_name:
+            errors.append(f"{where}: duplicate server name")
+            continue
+        ip = server.get('ip')
+        if not isinstance(ip, str) or not ip:
+            errors.append(f"{where}.ip is required")
+            continue
+        if not is_ipv4(ip):
+            # Still registered so services referencing it don't report it as missing
+            errors.append(f"{where}.ip must be an IPv4 address (got {ip!r})")
+        entry = dict(server)
+        compiled.append(entry)
+        by_name[name] = entry
+    return compiled, by_name
+
+
+def is_ipv4(ip):
+    """Whether ip is a valid IPv4 address; only A records are managed"""
+    # Imported here since validation only runs when the compiled config isn't cached
+    import ipaddress
+    try:
+        ipaddress.IPv4Address(ip)
+    except ValueError:
+        return False
+    return True
+
+
+def _compile_tls(errors, where, tls_config):
+    """Validate per-service TLS thresholds and fill in defaults"""
+    where = f"{where}.tls"
+    if not _check_type(errors, where, tls_config, dict, 'an object'):
+        return dict(DEFAULT_TLS)
+    unknown = set(tls_config) - set(DEFAULT_TLS)
+    if unknown:
+        errors.append(f"{where}: unknown option(s) {', '.join(sorted(unknown))}")
+    compiled = dict(DEFAULT_TLS)
+    compiled.update(tls_config)
+    for key in ('expiry_warn_days', 'expiry_fail_days'):
+        _check_type(errors, f"{where}.{key}", compiled[key], int, 'an integer')
+    if compiled['hostname_mismatch'] not in ('ignore', 'degraded', 'failed'):
+        errors.append(f"{where}.hostname_mismatch must be 'ignore', 'degraded' or 'failed'")
+    if compiled['min_version'] not in TLS_VERSIONS:
+        errors.append(f"{where}.min_version must be one of {', '.join(TLS_VERSIONS)}")
+    if compiled['max_handshake_ms'] is not None:
+        _check_type(errors, f"{where}.max_handshake_ms", compiled['max_handshake_ms'], float, 'a number')
+    return compiled
+
+
+def _compile_run_budget(errors, config):
+    """Validate the run budget and return stage shares in pipeline order"""
+    budget_config = config.get('run_budget', {})
+    if not _check_type(errors, 'run_budget', budget_config, dict, 'an object'):
+        budget_config = {}
+    total = budget_config.get('total_seconds', DEFAULT_RUN_BUDGET['total_seconds'])
+    if _check_type(errors, 'run_budget.total_seconds', total, float, 'a number') and total <= 0:
+        errors.append("run_budget.total_seconds must be positive")
+
+    stage_config = budget_config.get('stages', {})
+    if not _check_type(errors, 'run_budget.stages', stage_config, dict, 'an object'):
+        stage_config = {}
+    unknown = set(stage_config) - set(DEFAULT_RUN_BUDGET['stages'])
+    if unknown:
+        errors.append(f"run_budget.stages: unknown stage(s) {', '.join(sorted(unknown))}")
+    stages = {}
+    for stage, default in DEFAULT_RUN_BUDGET['stages'].items():
+        share = stage_config.get(stage, default)
+        if _check_type(errors, f"run_budget.stages.{stage}", share, float, 'a number') and not 0 <= share <= 1:
+            errors.append(f"run_budget.stages.{stage} must be between 0 and 1")
+        stages[stage] = share
+    if all(_is_int(v) or isinstance(v, float) for v in stages.values()) and sum(stages.values()) > 1.0001:
+        errors.append("run_budget.stages shares must not add up to more than 1")
+
+    return {'total_seconds': total, 'stages': stages}
+
+
+def _compile_dashboard(errors, config):
+    """Validate dashboard outputs and fill in default paths"""
+    dashboard_config = config.get('dashboard', {})
+    if not _check_type(errors, 'dashboard', dashboard_config, dict, 'an object'):
+        return dict(DEFAULT_DASHBOARD)
+    compiled = dict(DEFAULT_DASHBOARD)
+    compiled.update(dashboard_config)
+    if _check_type(errors, 'dashboard.outputs', compiled['outputs'], list, 'a list'):
+        unknown = [output for output in compiled['outputs'] if output not in DEFAULT_DASHBOARD['outputs']]
+        if unknown:
+            errors.append(f"dashboard.outputs: unknown output(s) {', '.join(map(str, unknown))}")
+    for key in ('markdown_path', 'json_path', 'html_path'):
+        if not isinstance(compiled[key], str) or not compiled[key]:
+            errors.append(f"dashboard.{key} must be a non-empty path")
+    return compiled
+
+
+def _compile_notifications(errors, config):
+    """Validate notification sinks and fill in defaults"""
+    notify_config = config.get('notifications', {})
+    if not _check_type(errors, 'notifications', notify_config, dict, 'an object'):
+        notify_config = {}
+    compiled = dict(DEFAULT_NOTIFICATIONS)
+    compiled.update(notify_config)
+    compiled['enabled'] = notify_config.get('enabled', bool(compiled['sinks']))
+    _check_type(errors, 'notifications.enabled', compiled['enabled'], bool, 'a boolean')
+    for key in ('cooldown_minutes', 'timeout_seconds'):
+        if _check_type(errors, f"notifications.{key}", compiled[key], float, 'a number') and compiled[key] < 0:
+            errors.append(f"notifications.{key} must not be negative")
+    if not _check_type(errors, 'notifications.sinks', compiled['sinks'], list, 'a list'):
+        compiled['sinks'] = []
+    for index, sink in enumerate(compiled['sinks']):
+        where = f"notifications.sinks[{index}]"
+        if not _check_type(errors, where, sink, dict, 'an object'):
+            continue
+        sink_type = sink.get('type')
+        if sink_type not in NOTIFICATION_SINK_FIELDS:
+            errors.append(f"{where}.type must be one of {', '.join(NOTIFICATION_SINK_FIELDS)}")
+            continue
+        for field in NOTIFICATION_SINK_FIELDS[sink_type]:
+            if not sink.get(field):
+                errors.append(f"{where}.{field} is required for {sink_type} sinks")
+        if sink_type == 'webhook' and not (sink.get('url') or sink.get('url_env')):
+            errors.append(f"{where} needs either url or url_env")
+        if sink_type == 'email' and not isinstance(sink.get('to', []), list):
+            errors.append(f"{where}.to must be a list of addresses")
+    if compiled['enabled'] and not compiled['sinks']:
+        errors.append("notifications.sinks must not be empty when notifications are enabled")
+    return compiled
+
+
+def _compile_service(errors, index, service, servers_by_name, cloudflare_enabled):
+    """Validate one service, fill in defaults and resolve its server references"""
+    where = f"services[{index}]"
+    if not _check_type(errors, where, service, dict, 'an object'):
+        return None
+    name = service.get('name')
+    if not isinstance(name, str) or not name:
+        errors.append(f"{where}.name is required")
+        return None
+    where = f"services[{index}] ({name})"
+
+    compiled = dict(service)
+
+    if not isinstance(service.get('hostname'), str) or not service.get('hostname'):
+        errors.append(f"{where}.hostname is required")
+
+    scheme = service.get('scheme', 'http')
+    if scheme not in ('http', 'https'):
+        errors.append(f"{where}.scheme must be 'http' or 'https', got {scheme!r}")
+    compiled['scheme'] = scheme
+
+    if 'port' in service:
+        port = service['port']
+        if isinstance(port, str) and port.isdigit():
+            port = int(port)
+        if not _is_int(port) or not 1 <= port <= 65535:
+            errors.append(f"{where}.port must be an integer between 1 and 65535, got {service['port']!r}")
+        compiled['port'] = port
+    else:
+        compiled['port'] = 443 if scheme == 'https' else 80
+
+    path = service.get('healthcheck_path')
+    if path is not None and (not isinstance(path, str) or not path.startswith('/')):
+        errors.append(f"{where}.healthcheck_path must start with '/', got {path!r}")
+
+    timeout = service.get('timeout', DEFAULT_TIMEOUT)
+    if _check_type(errors, f"{where}.timeout", timeout, float, 'a number') and timeout <= 0:
+        errors.append(f"{where}.timeout must be positive")
+    compiled['timeout'] = timeout
+
+    if scheme == 'https':
+        compiled['tls'] = _compile_tls(errors, where, service.get('tls', {}))
+
+    # Resolve server references
+    server_names = service.get('servers')
+    resolved = []
+    if not isinstance(server_names, list) or not server_names:
+        errors.append(f"{where}.servers must be a non-empty list of server names")
+        server_names = []
+    for server_name in server_names:
+        server = servers_by_name.get(server_name)
+        if server is None:
+            errors.append(f"{where}: server '{server_name}' not found in server definitions")
+            continue
+        resolved.append({'name': server['name'], 'ip': server['ip']})
+    compiled['resolved_servers'] = resolved
+
+    cf_config = service.get('cloudflare', {})
+    if not _check_type(errors, f"{where}.cloudflare", cf_config, dict, 'an object'):
+        cf_config = {}
+    cf_compiled = dict(cf_config)
+    cf_compiled['update_dns'] = cf_config.get('update_dns', False)
+    _check_type(errors, f"{where}.cloudflare.update_dns", cf_compiled['update_dns'], bool, 'a boolean')
+    cf_compiled['proxied'] = cf_config.get('proxied', DEFAULT_PROXIED)
+    _check_type(errors, f"{where}.cloudflare.proxied", cf_compiled['proxied'], bool, 'a boolean')
+    cf_compiled['ttl'] = cf_config.get('ttl', DEFAULT_TTL)
+    if _check_type(errors, f"{where}.cloudflare.ttl", cf_compiled['ttl'], int, 'an integer'):
+        # Cloudflare accepts 1 (automatic) or 60-86400 seconds
+        if cf_compiled['ttl'] != 1 and not 60 <= cf_compiled['ttl'] <= 86400:
+            errors.append(f"{where}.cloudflare.ttl must be 1 (auto) or between 60 and 86400")
+    if cloudflare_enabled and cf_compiled['update_dns'] and not cf_config.get('zone_id'):
+        errors.append(f"{where}.cloudflare.zone_id is required when update_dns is enabled")
+    compiled['cloudflare'] = cf_compiled
+
+    return compiled
+
+
+def compile_config(config):
+    """Validate a raw config dict and return the normalized config.
+
+    Raises ConfigError listing every problem found, so a bad config fails
+    before any probes run.
+    """
+    errors = []
+    if not isinstance(config, dict):
+        raise ConfigError(['configuration must be a JSON object'])
+
+    logging_config = _validate_section(errors, config, 'logging')
+    if logging_config.get('enabled') and not logging_config.get('repository'):
+        errors.append("logging.repository is required when logging is enabled")
+    cloudflare_config = _validate_section(errors, config, 'cloudflare')
+
+    servers, servers_by_name = _compile_servers(errors, config)
+    run_budget = _compile_run_budget(errors, config)
+    dashboard = _compile_dashboard(errors, config)
+    notifications = _compile_notifications(errors, config)
+
+    services = config.get('services', [])
+    compiled_services = []
+    if not isinstance(services, list):
+        errors.append("'services' must be a list")
+        services = []
+    seen = set()
+    for index, service in enumerate(services):
+        compiled = _compile_service(errors, index, service, servers_by_name,
+                                    cloudflare_config.get('enabled', False))
+        if compiled is None:
+            continue
+        if compiled['name'] in seen:
+            errors.append(f"services[{index}] ({compiled['name']}): duplicate service name")
+            continue
+        seen.add(compiled['name'])
+        compiled_services.append(compiled)
+
+    if errors:
+        raise ConfigError(errors)
+
+    compiled = dict(config)
+    compiled['servers'] = servers
+    compiled['services'] = compiled_services
+    compiled['run_budget'] = run_budget
+    compiled['dashboard'] = dashboard
+    compiled['notifications'] = notifications
+    return compiled
+
+
+def is_fragment_name(name):
+    """Whether name is safe to use as a fragment file name"""
+    return isinstance(name, str) and FRAGMENT_NAME_PATTERN.fullmatch(name) is not None
+
+
+def fragment_path(kind, name, fragment_dir=FRAGMENT_DIR):
+    """Path of the fragment file holding one server or service"""
+    if not is_fragment_name(name):
+        raise ConfigError([f"{kind} name {name!r} can't be used as a file name "
+                           f"(letters, digits, '.', '_' and '-' only, not starting with '.')"])
+    return os.path.join(fragment_dir, kind, f"{name}.json")
+
+
+def _read_fragments(fragment_dir, kind):
+    """Read all fragment files of one kind as [(path, bytes)]"""
+    directory = os.path.join(fragment_dir, kind)
+    try:
+        filenames = sorted(f for f in os.listdir(directory) if f.endswith('.json'))
+    except FileNotFoundError:
+        return []
+
+    fragments = []
+    for filename in filenames:
+        path = os.path.join(directory, filename)
+        try:
+            with open(path, 'rb') as f:
+                fragments.append((path, f.read()))
+        except FileNotFoundError:
+            continue
+    return fragments
+
+
+def _parse_json(path, raw):
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ConfigError([f"{path} is not valid JSON: {e}"])
+
+
+def _merge_fragments(config, kind, fragments):
+    """Merge fragment entries into config[kind].
+
+    Each fragment holds one entry named after its file. A fragment replaces
+    a base entry with the same name, so an entry can be moved out of the
+    base file, or overridden, one file at a time.
+    """
+    errors = []
+    entries = list(config.get(kind, []))
+    index = {entry.get('name'): i for i, entry in enumerate(entries) if isinstance(entry, dict)}
+    for path, raw in fragments:
+        entry = _parse_json(path, raw)
+        name = os.path.basename(path)[:-len('.json')]
+        if not isinstance(entry, dict):
+            errors.append(f"{path} must contain a single object")
+            continue
+        entry.setdefault('name', name)
+        if entry['name'] != name:
+            errors.append(f"{path}: name '{entry['name']}' does not match the file name")
+            continue
+        if name in index:
+            entries[index[name]] = entry
+        else:
+            index[name] = len(entries)
+            entries.append(entry)
+    if errors:
+        raise ConfigError(errors)
+    config[kind] = entries
+
+
+def _cache_path(digest):
+    return os.path.join(tempfile.gettempdir(), f"actionsha-config-{digest}.json")
+
+
+def load_config(path=CONFIG_PATH, fragment_dir=None):
+    """Load, validate and normalize the monitor configuration.
+
+    Server and service fragments under fragment_dir (default: 'ha' next to
+    the config file) are merged into the base file.
+
+    The compiled result is cached by the hash of every file read, in-process
+    and on disk, so every stage in a pipeline run validates the same
+    configuration only once. The returned dict is shared between callers and
+    must not be modified.
+    """
+    if fragment_dir is None:
+        fragment_dir = os.path.join(os.path.dirname(path), 'ha')
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    sources = [(path, raw)]
+
+    for kind in FRAGMENT_KINDS:
+        sources.extend(_read_fragments(fragment_dir, kind))
+
+    digest_source = hashlib.sha256()
+    for source_path, source_raw in sources:
+        digest_source.update(source_path.encode() + b'\0' + hashlib.sha256(source_raw).digest())
+    digest = digest_source.hexdigest()
+
+    if digest in _compiled_cache:
+        return _compiled_cache[digest]
+
+    cache_path = _cache_path(digest)
+    try:
+        with open(cache_path, 'r') as f:
+            cached = json.load(f)
+        if cached.get('version') == COMPILED_VERSION:
+            _compiled_cache[digest] = cached['config']
+            return cached['config']
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    config = _parse_json(path, raw)
+    if isinstance(config, dict):
+        for kind in FRAGMENT_KINDS:
+            _merge_fragments(config, kind, [(p, r) for p, r in sources[1:]
+                                            if os.path.basename(os.path.dirname(p)) == kind])
+    compiled = compile_config(config)
+
+    # Write atomically so concurrent stages never read a partial file
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': COMPILED_VERSION, 'config': compiled}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+    _compiled_cache[digest] = compiled
+    return compiled
+
+
+def load_config_or_exit(path=CONFIG_PATH):
+    """Load the configuration, printing errors and exiting on failure"""
+    import sys
+    try:
+        return load_config(path)
+    except FileNotFoundError:
+        print(f"ERROR: Configuration file not found: {path}")
+        sys.exit(1)
+    except ConfigError as e:
+        print(f"ERROR: Invalid configuration in {path}:\n{e}")
+        print(f"::error title=Invalid Configuration::{len(e.errors)} problem(s) in {path}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    import sys
+
+    config_path = sys.argv[1] if len(sys.argv) > 1 else CONFIG_PATH
+    config = load_config_or_exit(config_path)
+    print(f"✅ Configuration OK: {len(config['servers'])} servers, {len(config['services'])} services")
@@ -1,21 +1,61 @@
 #!/usr/bin/env python3
 import os
+import re
 import json
+import html
 import base64
+import hashlib
 from datetime import datetime
 
+from budget import RunBudget, call_timeout
+from config_loader import load_config_or_exit
+import http_client
+
+# Upper bound for a single GitHub API call
+API_TIMEOUT = 30
+
+# Version of the status.json schema; bump on incompatible changes
+STATUS_SCHEMA_VERSION = 2
+
+# Bump when any template changes so outputs are rewritten even if the model is unchanged
+TEMPLATE_VERSION = 1
+
+# Hash marker embedded in Markdown and HTML outputs
+HASH_MARKER_PATTERN = re.compile(r'<!-- ha-dashboard-hash: ([0-9a-f]+) -->')
+
+# Measured values in server messages (e.g. "handshake took 523ms", "expires in 12d"),
+# masked in the content hash; other numbers such as status codes and ports are kept
+MEASUREMENT_PATTERN = re.compile(r'\d+(?:\.\d+)?\s*(?:ms|s|d)\b')
+
+SERVER_STATE_DISPLAY = {
+    'healthy': '✅ Healthy',
+    'degraded': '⚠️ Degraded',
+    'failed': '❌ Failed',
+    'skipped': '⏭️ Not checked'
+}
+
+DNS_STATUS_DISPLAY = {
+    'ok': '✅ Synced',
+    'updated': '🔄 Updated',
+    'partial': '⚠️ Partially updated',
+    'mismatch': '⚠️ Mismatch',
+    'skipped': '⏭️ Not reconciled',
+    'error': '❌ Error',
+    None: '➖ N/A'
+}
+
 
 class DashboardTemplates:
     """Templates for dashboard components"""
     
     @staticmethod
-    def header(repo):
+    def header(repo, updated):
         """Generate dashboard header"""
         return f"""# ActionsHA Dashboard
 
 [![HA Monitor](https://github.com/{repo}/actions/workflows/ha-monitor.yml/badge.svg)](https://github.com/{repo}/actions/workflows/ha-monitor.yml)
 
-Last Updated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
+Last Updated: {updated.strftime('%Y-%m-%d %H:%M:%S')} UTC
 
 """
 
@@ -42,14 +82,7 @@ Last Updated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
     def service_details(service_info):
         """Generate individual service details"""
         status_icon = "🟢" if service_info['is_healthy'] else "🔴"
-        
-        dns_status_map = {
-            'ok': '✅ Synced',
-            'updated': '🔄 Updated',
-            'mismatch': '⚠️ Mismatch',
-            None: '➖ N/A'
-        }
-        dns_display = dns_status_map.get(service_info['dns_status'], '➖ N/A')
+        dns_display = DNS_STATUS_DISPLAY.get(service_info['dns_status'], '➖ N/A')
         
         template = f"""### {status_icon} {service_info['name']}
 
@@ -57,13 +90,15 @@ Last Updated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
 - **Health**: {service_info['healthy_count']}/{service_info['total_count']} servers healthy
 - **DNS Status**: {dns_display}
 
-| Server | IP Address | Status |
-|--------|------------|--------|
+| Server | IP Address | Status | Latency |
+|--------|------------|--------|---------|
 """
         
         # Add server status rows
         for server_info in service_info['server_statuses']:
-            template += f"| {server_info['server']} | `{server_info['ip']}` | {server_info['status']} |\n"
+            status = SERVER_STATE_DISPLAY[server_info['state']]
+            latency = f"{server_info['latency_ms']:.0f} ms" if server_info['latency_ms'] is not None else '-'
+            template += f"| {server_info['server']} | `{server_info['ip']}` | {status} | {latency} |\n"
         
         template += "\n"
         return template
@@ -81,10 +116,80 @@ Last Updated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
 """
 
     @staticmethod
-    def footer(repo):
+    def footer(repo, content_hash):
         """Generate dashboard footer"""
         return f"""---
 *This dashboard is automatically generated by [HA Monitor](https://github.com/{repo}/blob/main/.github/workflows/ha-monitor.yml)*
+
+<!-- ha-dashboard-hash: {content_hash} -->
+"""
+
+
+class StatusPageTemplates:
+    """Templates for the static HTML status page"""
+    
+    STATE_COLORS = {
+        'healthy': '#1a7f37',
+        'degraded': '#9a6700',
+        'failed': '#cf222e',
+        'skipped': '#57606a'
+    }
+    
+    @staticmethod
+    def page(title, body, updated, content_hash):
+        """Generate the complete HTML document"""
+        return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{html.escape(title)}</title>
+<style>
+body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Helvetica, Arial, sans-serif; max-width: 960px; margin: 2rem auto; padding: 0 1rem; color: #1f2328; }}
+table {{ border-collapse: collapse; width: 100%; margin-bottom: 1.5rem; }}
+th, td {{ text-align: left; padding: 0.4rem 0.6rem; border-bottom: 1px solid #d0d7de; }}
+code {{ font-size: 0.9em; }}
+.state {{ font-weight: 600; }}
+.muted {{ color: #57606a; }}
+</style>
+</head>
+<body>
+<h1>{html.escape(title)}</h1>
+<p class="muted">Last Updated: {updated.strftime('%Y-%m-%d %H:%M:%S')} UTC</p>
+{body}
+<!-- ha-dashboard-hash: {content_hash} -->
+</body>
+</html>
+"""
+    
+    @staticmethod
+    def overview(stats):
+        """Generate overview table"""
+        return f"""<h2>Overview</h2>
+<table>
+<tr><th>Healthy Services</th><td>{stats['healthy_services']}/{stats['total_services']} ({stats['healthy_percentage']:.1f}%)</td></tr>
+<tr><th>Healthy Servers</th><td>{stats['healthy_servers']}/{stats['total_servers']} ({stats['servers_percentage']:.1f}%)</td></tr>
+</table>
+"""
+    
+    @classmethod
+    def service(cls, service_info):
+        """Generate a service section with its server table"""
+        state = 'healthy' if service_info['is_healthy'] else 'failed'
+        dns_display = DNS_STATUS_DISPLAY.get(service_info['dns_status'], '➖ N/A')
+        rows = ''
+        for server_info in service_info['server_statuses']:
+            latency = f"{server_info['latency_ms']:.0f} ms" if server_info['latency_ms'] is not None else '-'
+            rows += (f"<tr><td>{html.escape(server_info['server'])}</td>"
+                     f"<td><code>{html.escape(server_info['ip'])}</code></td>"
+                     f"<td class=\"state\" style=\"color: {cls.STATE_COLORS[server_info['state']]}\">"
+                     f"{SERVER_STATE_DISPLAY[server_info['state']]}</td>"
+                     f"<td>{latency}</td></tr>\n")
+        return f"""<h3 style="color: {cls.STATE_COLORS[state]}">{html.escape(service_info['name'])}</h3>
+<p><code>{html.escape(service_info['endpoint'])}</code> &middot; {service_info['healthy_count']}/{service_info['total_count']} servers healthy &middot; DNS: {dns_display}</p>
+<table>
+<tr><th>Server</th><th>IP Address</th><th>Status</th><th>Latency</th></tr>
+{rows}</table>
 """
 
 
@@ -96,7 +201,10 @@ class DashboardBuilder:
         self.health_results = health_results
         self.dns_results = dns_results
         self.templates = DashboardTemplates()
+        self.page_templates = StatusPageTemplates()
         self.repo = config['logging'].get('repository')
+        self.updated = datetime.utcnow()
+        self._model = None
     
     def calculate_statistics(self):
         """Calculate dashboard statistics"""
@@ -128,30 +236,31 @@ class DashboardBuilder:
         
         # Build server status list
         server_statuses = []
-        servers = self.config.get('servers', [])
-        for server_name in service.get('servers', []):
-            # Find server by name in the list
-            server = None
-            for s in servers:
-                if s['name'] == server_name:
-                    server = s
-                    break
-            if not server:
-                continue
-            ip = server['ip']
-            if server['name'] in health_result.get('healthy_servers', []):
-                server_statuses.append({'server': server['name'], 'ip': ip, 'status': '✅ Healthy'})
+        errors = {detail['server']: detail.get('error') for detail in health_result.get('failed_server_details', [])}
+        warnings = {detail['server']: detail.get('warning') for detail in health_result.get('degraded_server_details', [])}
+        for server in service['resolved_servers']:
+            if server['name'] in health_result.get('skipped_servers', []):
+                state = 'skipped'
+            elif server['name'] in health_result.get('degraded_servers', []):
+                state = 'degraded'
+            elif server['name'] in health_result.get('healthy_servers', []):
+                state = 'healthy'
             else:
-                server_statuses.append({'server': server['name'], 'ip': ip, 'status': '❌ Failed'})
+                state = 'failed'
+            server_statuses.append({
+                'server': server['name'],
+                'ip': server['ip'],
+                'state': state,
+                'latency_ms': health_result.get('latency_ms', {}).get(server['name']),
+                'error': errors.get(server['name']) or warnings.get(server['name'])
+            })
         
         # Build endpoint string based on available fields
         if 'healthcheck_path' in service:
-            scheme = service.get('scheme', 'http')
-            endpoint = f"{scheme}://{service['hostname']}{service['healthcheck_path']}"
+            endpoint = f"{service['scheme']}://{service['hostname']}{service['healthcheck_path']}"
         else:
             # TCP port check - just show hostname:port
-            port = service.get('port', '443' if service.get('scheme') == 'https' else '80')
-            endpoint = f"{service['hostname']}:{port} (TCP)"
+            endpoint = f"{service['hostname']}:{service['port']} (TCP)"
         
         return {
             'name': service['name'],
@@ -159,37 +268,173 @@ class DashboardBuilder:
             'is_healthy': health_result['failed_count'] == 0,
             'healthy_count': len(health_result.get('healthy_servers', [])),
             'total_count': len(service.get('servers', [])),
+            'hostname': service['hostname'],
             'dns_status': dns_result.get('status'),
             'server_statuses': server_statuses
         }
     
+    def build_model(self):
+        """Compute statistics and service details once for all output formats"""
+        if self._model is None:
+            services = []
+            for service in self.config.get('services', []):
+                service_info = self.build_service_info(service)
+                if service_info:
+                    services.append(service_info)
+            self._model = {
+                'stats': self.calculate_statistics(),
+                'services': services
+            }
+        return self._model
+    
+    def content_hash(self):
+        """Hash of the model used to skip unchanged writes.
+
+        Timestamps, latencies and the measured durations and day counts in
+        server messages vary on every run, so they are left out; outputs are
+        rewritten when any state, IP, message or DNS status changes.
+        """
+        model = self.build_model()
+        stable_services = [
+            dict(service_info, server_statuses=[
+                dict({key: value for key, value in server_info.items() if key != 'latency_ms'},
+                     error=MEASUREMENT_PATTERN.sub('#', server_info['error'] or ''))
+                for server_info in service_info['server_statuses']
+            ])
+            for service_info in model['services']
+        ]
+        canonical = json.dumps([TEMPLATE_VERSION, model['stats'], stable_services],
+                               sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+    
     def build(self):
         """Build the complete dashboard content"""
-        # Calculate statistics
-        stats = self.calculate_statistics()
+        model = self.build_model()
         
         # Start building dashboard
-        content = self.templates.header(self.repo)
-        content += self.templates.overview_section(stats)
+        content = self.templates.header(self.repo, self.updated)
+        content += self.templates.overview_section(model['stats'])
         content += self.templates.service_status_header()
         
         # Add service details
-        for service in self.config.get('services', []):
-            service_info = self.build_service_info(service)
-            if service_info:
-                content += self.templates.service_details(service_info)
+        for service_info in model['services']:
+            content += self.templates.service_details(service_info)
         
         # Add links and footer
         content += self.templates.links_section(self.repo)
-        content += self.templates.footer(self.repo)
+        content += self.templates.footer(self.repo, self.content_hash())
         
         return content
+    
+    def build_status_json(self):
+        """Build the compact machine-readable status document"""
+        model = self.build_model()
+        stats = model['stats']
+        status = {
+            'version': STATUS_SCHEMA_VERSION,
+            # Files are only written when the content hash changes
+            'changed_at': self.updated.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'hash': self.content_hash(),
+            'summary': {
+                'services': stats['total_services'],
+                'healthy_services': stats['healthy_services'],
+                'servers': stats['total_servers'],
+                'healthy_servers': stats['healthy_servers']
+            },
+            'services': [
+                {
+                    'name': service_info['name'],
+                    'hostname': service_info['hostname'],
+                    'healthy': service_info['is_healthy'],
+                    'healthy_count': service_info['healthy_count'],
+                    'total_count': service_info['total_count'],
+                    'dns': service_info['dns_status'],
+                    'servers': [
+                        {
+                            'name': server_info['server'],
+                            'ip': server_info['ip'],
+                            'state': server_info['state'],
+                            'latency_ms': server_info['latency_ms'],
+                            'error': server_info['error']
+                        }
+                        for server_info in service_info['server_statuses']
+                    ]
+                }
+                for service_info in model['services']
+            ]
+        }
+        return json.dumps(status, separators=(',', ':'), ensure_ascii=False) + '\n'
+    
+    def build_html(self):
+        """Build the static HTML status page"""
+        model = self.build_model()
+        body = self.page_templates.overview(model['stats'])
+        body += "<h2>Service Status</h2>\n"
+        for service_info in model['services']:
+            body += self.page_templates.service(service_info)
+        return self.page_templates.page('ActionsHA Status', body, self.updated, self.content_hash())
+    
+    def build_outputs(self):
+        """Build every enabled output, returning {repository path: content}"""
+        dashboard_config = self.config['dashboard']
+        renderers = {
+            'markdown': (dashboard_config['markdown_path'], self.build),
+            'json': (dashboard_config['json_path'], self.build_status_json),
+            'html': (dashboard_config['html_path'], self.build_html)
+        }
+        outputs = {}
+        for output in dashboard_config['outputs']:
+            path, render = renderers[output]
+            outputs[path] = render()
+        return outputs
+
+
+def extract_content_hash(content):
+    """Return the model hash embedded in a previously published output, if any"""
+    match = HASH_MARKER_PATTERN.search(content)
+    if match:
+        return match.group(1)
+    try:
+        return json.loads(content).get('hash')
+    except (ValueError, AttributeError):
+        return None
 
 
-def generate_dashboard(config, health_results, dns_results):
-    # Import requests here to avoid import errors when module is loaded
-    import requests
-    """Generate and update README dashboard"""
+def publish_file(repo, path, content, content_hash, headers, budget=None):
+    """Write a file to the repository unless it already holds this content hash"""
+    api_url = f"https://api.github.com/repos/{repo}/contents/{path}"
+    
+    # Check if file exists and whether its content changed
+    existing_file = http_client.get(api_url, headers=headers, timeout=call_timeout(budget, API_TIMEOUT))
+    sha = None
+    if existing_file.status_code == 200:
+        file_data = existing_file.json()
+        sha = file_data['sha']
+        existing_content = base64.b64decode(file_data.get('content', '')).decode(errors='replace')
+        if extract_content_hash(existing_content) == content_hash:
+            print(f"   ⏸️  {path} unchanged, skipping")
+            return True
+    
+    # Prepare update
+    data = {
+        'message': f'Update HA Monitor dashboard - {datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")} UTC',
+        'content': base64.b64encode(content.encode()).decode(),
+        'branch': 'main'
+    }
+    if sha:
+        data['sha'] = sha
+    
+    response = http_client.put(api_url, headers=headers, json=data, timeout=call_timeout(budget, API_TIMEOUT))
+    
+    if response.status_code in [200, 201]:
+        print(f"   ✅ Updated {path}")
+        return True
+    print(f"   ❌ Failed to update {path}: {response.status_code} - {response.text}")
+    return False
+
+
+def generate_dashboard(config, health_results, dns_results, budget=None):
+    """Generate and publish the dashboard outputs"""
     print("\n📊 Generating dashboard...")
     
     repo = config['logging'].get('repository')
@@ -200,38 +445,22 @@ def generate_dashboard(config, health_results, dns_results):
         return
     
     try:
-        # Build dashboard content using templates
+        # Build all outputs from the same model in one pass
         builder = DashboardBuilder(config, health_results, dns_results)
-        readme_content = builder.build()
+        outputs = builder.build_outputs()
+        content_hash = builder.content_hash()
         
-        # Update README via GitHub API
-        readme_api_url = f"https://api.github.com/repos/{repo}/contents/README.md"
         headers = {
             'Authorization': f'token {token}',
             'Accept': 'application/vnd.github.v3+json'
         }
         
-        # Check if README exists
-        existing_readme = requests.get(readme_api_url, headers=headers)
+        results = [publish_file(repo, path, content, content_hash, headers, budget)
+                   for path, content in outputs.items()]
         
-        # Prepare update
-        readme_data = {
-            'message': f'Update HA Monitor dashboard - {datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")} UTC',
-            'content': base64.b64encode(readme_content.encode()).decode(),
-            'branch': 'main'
-        }
-        
-        if existing_readme.status_code == 200:
-            readme_data['sha'] = existing_readme.json()['sha']
-        
-        # Update README
-        readme_response = requests.put(readme_api_url, headers=headers, json=readme_data)
-        
-        if readme_response.status_code in [200, 201]:
+        if all(results):
             print("✅ Dashboard updated successfully!")
             print(f"   View at: https://github.com/{repo}")
-        else:
-            print(f"❌ Failed to update dashboard: {readme_response.status_code} - {readme_response.text}")
             
     except Exception as e:
         print(f"❌ Error generating dashboard: {str(e)}")
@@ -241,8 +470,7 @@ if __name__ == "__main__":
     import sys
     
     # Read config
-    with open('.github/ha-monitor-config.json', 'r') as f:
-        config = json.load(f)
+    config = load_config_or_exit()
     
     # Read results from stdin
     data = json.loads(sys.stdin.read())
@@ -250,4 +478,4 @@ if __name__ == "__main__":
     dns_results = data['dns_results']
     
     # Generate dashboard
-    generate_dashboard(config, health_results, dns_results)
\ No newline at end of file
+    generate_dashboard(config, health_results, dns_results, RunBudget.from_env(config, 'dashboard'))
\ No newline at end of file
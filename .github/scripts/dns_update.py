@@ -2,10 +2,57 @@
 import os
 import json
 
+from budget import RunBudget, BudgetExhausted, call_timeout
+from config_loader import load_config_or_exit
+import http_client
 
-def update_dns_for_service(service, healthy_servers, config):
-    # Import requests here to avoid import errors when module is loaded
-    import requests
+# Upper bound for a single Cloudflare API call
+API_TIMEOUT = 15
+
+# Time to allow per record change when checking a change set fits the budget
+CHANGE_CALL_SECONDS = 3
+
+
+def plan_dns_changes(service, healthy_servers, current_ips, skipped_servers=()):
+    """Compute the DNS change set for a service without any network I/O.
+
+    Servers that were not checked keep their current records, so only
+    completed health checks can add or remove an IP.
+    """
+    healthy_ips = {server['ip'] for server in service['resolved_servers']
+                   if server['name'] in healthy_servers}
+    skipped_ips = {server['ip'] for server in service['resolved_servers']
+                   if server['name'] in skipped_servers}
+    current = set(current_ips)
+    kept = (current & skipped_ips) - healthy_ips
+    target = healthy_ips | kept
+    
+    return {
+        'previous': sorted(current),
+        'target': sorted(target),
+        'removed': sorted(current - target),
+        'added': sorted(target - current),
+        'kept': sorted(kept)
+    }
+
+
+def fetch_dns_records(zone_id, hostname, headers, budget=None):
+    """Fetch existing A records for a hostname as {ip: record_id}, or None on failure"""
+    response = http_client.get(
+        f'https://api.cloudflare.com/client/v4/zones/{zone_id}/dns_records',
+        headers=headers,
+        params={'type': 'A', 'name': hostname},
+        timeout=call_timeout(budget, API_TIMEOUT)
+    )
+    
+    if response.status_code != 200:
+        print(f"❌ Failed to fetch DNS records: {response.text}")
+        return None
+    
+    return {record['content']: record['id'] for record in response.json()['result']}
+
+
+def update_dns_for_service(service, healthy_servers, config, skipped_servers=(), budget=None):
     """Check and update DNS records for a service"""
     cf_config = service.get('cloudflare', {})
     if not cf_config.get('zone_id') or not config.get('cloudflare', {}).get('enabled', False):
@@ -32,32 +79,19 @@ def update_dns_for_service(service, healthy_servers, config):
         'Content-Type': 'application/json'
     }
     
-    # Convert healthy server names to IPs
-    servers_list = config.get('servers', [])
-    healthy_ips = []
-    for server_name in healthy_servers:
-        for server in servers_list:
-            if server['name'] == server_name:
-                healthy_ips.append(server['ip'])
-                break
-    
     # Get existing A records
-    response = requests.get(
-        f'https://api.cloudflare.com/client/v4/zones/{zone_id}/dns_records',
-        headers=headers,
-        params={'type': 'A', 'name': hostname}
-    )
-    
-    if response.status_code != 200:
-        print(f"❌ Failed to fetch DNS records: {response.text}")
+    existing_ips = fetch_dns_records(zone_id, hostname, headers, budget)
+    if existing_ips is None:
         return None
     
-    existing_records = response.json()['result']
-    existing_ips = {record['content']: record['id'] for record in existing_records}
+    # Work out the target record set from healthy server IPs
+    plan = plan_dns_changes(service, healthy_servers, existing_ips, skipped_servers)
+    for ip in plan['kept']:
+        print(f"   ⏭️  Keeping {ip} in DNS (not checked this run)")
     
     # Check if DNS state matches healthy IPs
-    dns_ips = set(existing_ips.keys())
-    healthy_set = set(healthy_ips)
+    dns_ips = set(plan['previous'])
+    healthy_set = set(plan['target'])
     
     dns_changes = {}
     dns_status = 'ok'
@@ -68,8 +102,8 @@ def update_dns_for_service(service, healthy_servers, config):
         print(f"      Healthy IPs: {', '.join(sorted(healthy_set)) if healthy_set else 'None'}")
         
         # Show what needs to change
-        to_remove = dns_ips - healthy_set
-        to_add = healthy_set - dns_ips
+        to_remove = set(plan['removed'])
+        to_add = set(plan['added'])
         
         if to_remove:
             print(f"      IPs to remove: {', '.join(sorted(to_remove))}")
@@ -77,12 +111,7 @@ def update_dns_for_service(service, healthy_servers, config):
             print(f"      IPs to add: {', '.join(sorted(to_add))}")
         
         # Store DNS change details
-        dns_changes = {
-            'previous': sorted(dns_ips),
-            'target': sorted(healthy_set),
-            'removed': sorted(to_remove),
-            'added': sorted(to_add)
-        }
+        dns_changes = {key: plan[key] for key in ('previous', 'target', 'removed', 'added')}
         
         # GitHub Actions workflow warning
         warning_msg = f"DNS mismatch for {hostname}: Current [{', '.join(sorted(dns_ips))}] != Healthy [{', '.join(sorted(healthy_set))}]"
@@ -94,39 +123,76 @@ def update_dns_for_service(service, healthy_servers, config):
     
     # Only perform updates if enabled
     if should_update and dns_ips != healthy_set:
-        # Delete records for unhealthy IPs
-        for ip, record_id in existing_ips.items():
-            if ip not in healthy_ips:
-                delete_response = requests.delete(
-                    f'https://api.cloudflare.com/client/v4/zones/{zone_id}/dns_records/{record_id}',
-                    headers=headers
-                )
-                if delete_response.status_code == 200:
-                    print(f"   ➖ Removed unhealthy IP: {ip}")
-                else:
-                    print(f"   ❌ Failed to remove {ip}: {delete_response.text}")
+        # Don't start a change set the budget can't finish
+        change_count = len(to_add) + len(to_remove)
+        if budget and budget.remaining() < change_count * CHANGE_CALL_SECONDS:
+            raise BudgetExhausted(f"{budget.remaining():.1f}s left for {change_count} record change(s)")
+        
+        added = []
+        removed = []
+        failed = []
         
-        # Add records for new healthy IPs
-        for ip in healthy_ips:
-            if ip not in existing_ips:
-                create_response = requests.post(
+        # Add records for new healthy IPs first, so the hostname never runs out of records mid-way
+        for ip in sorted(to_add):
+            try:
+                create_response = http_client.post(
                     f'https://api.cloudflare.com/client/v4/zones/{zone_id}/dns_records',
                     headers=headers,
                     json={
                         'type': 'A',
                         'name': hostname,
                         'content': ip,
-                        'ttl': cf_config.get('ttl', 120),
-                        'proxied': cf_config.get('proxied', False)
-                    }
+                        'ttl': cf_config['ttl'],
+                        'proxied': cf_config['proxied']
+                    },
+                    timeout=call_timeout(budget, API_TIMEOUT)
                 )
-                if create_response.status_code == 200:
-                    print(f"   ➕ Added healthy IP: {ip}")
-                else:
-                    print(f"   ❌ Failed to add {ip}: {create_response.text}")
+            except (BudgetExhausted, OSError) as e:
+                print(f"   ❌ Failed to add {ip}: {e}")
+                failed.append(f"add {ip}")
+                continue
+            if create_response.status_code == 200:
+                print(f"   ➕ Added healthy IP: {ip}")
+                added.append(ip)
+            else:
+                print(f"   ❌ Failed to add {ip}: {create_response.text}")
+                failed.append(f"add {ip}")
         
-        print("✅ DNS update complete!")
-        dns_status = 'updated'
+        # Delete records for unhealthy IPs, unless their replacements could not be added
+        adds_failed = bool(failed)
+        for ip in sorted(to_remove):
+            if adds_failed:
+                print(f"   ⏭️  Keeping {ip}: replacement records were not added")
+                failed.append(f"remove {ip}")
+                continue
+            try:
+                delete_response = http_client.delete(
+                    f'https://api.cloudflare.com/client/v4/zones/{zone_id}/dns_records/{existing_ips[ip]}',
+                    headers=headers,
+                    timeout=call_timeout(budget, API_TIMEOUT)
+                )
+            except (BudgetExhausted, OSError) as e:
+                print(f"   ❌ Failed to remove {ip}: {e}")
+                failed.append(f"remove {ip}")
+                continue
+            if delete_response.status_code == 200:
+                print(f"   ➖ Removed unhealthy IP: {ip}")
+                removed.append(ip)
+            else:
+                print(f"   ❌ Failed to remove {ip}: {delete_response.text}")
+                failed.append(f"remove {ip}")
+        
+        # Report what was actually changed
+        dns_changes['removed'] = removed
+        dns_changes['added'] = added
+        if failed:
+            dns_changes['current'] = sorted((dns_ips - set(removed)) | set(added))
+            dns_changes['failed'] = failed
+            print(f"::warning title=DNS Partially Updated::{hostname}: {', '.join(failed)} not applied")
+            dns_status = 'partial' if added or removed else 'error'
+        else:
+            print("✅ DNS update complete!")
+            dns_status = 'updated'
     elif not should_update and dns_ips != healthy_set:
         print("   ⚠️  DNS updates are disabled for this service. Enable 'update_dns' to sync.")
         print(f"::warning title=DNS Updates Disabled::DNS mismatch for {hostname} but update_dns is false")
@@ -141,8 +207,7 @@ if __name__ == "__main__":
     import sys
     
     # Read config
-    with open('.github/ha-monitor-config.json', 'r') as f:
-        config = json.load(f)
+    config = load_config_or_exit()
     
     # Read health check results from stdin
     stdin_data = sys.stdin.read()
@@ -157,13 +222,24 @@ if __name__ == "__main__":
         print(f"Input was: {stdin_data[:100]}...")
         sys.exit(1)
     
-    # Process DNS updates
+    budget = RunBudget.from_env(config, 'dns')
+    
+    # Process DNS updates, DNS-managed services first
     dns_results = {}
-    for service in config.get('services', []):
+    services = sorted(config['services'], key=lambda svc: not svc['cloudflare']['update_dns'])
+    for service in services:
         service_name = service['name']
         if service_name in health_results:
-            healthy_servers = health_results[service_name].get('healthy_servers', [])
-            dns_result = update_dns_for_service(service, healthy_servers, config)
+            health_result = health_results[service_name]
+            try:
+                dns_result = update_dns_for_service(service, health_result.get('healthy_servers', []), config,
+                                                    health_result.get('skipped_servers', []), budget)
+            except BudgetExhausted as e:
+                print(f"   ⏭️  DNS not reconciled: {e}")
+                dns_result = {'status': 'skipped', 'changes': {}}
+            except Exception as e:
+                print(f"   ❌ DNS update failed: {e}")
+                dns_result = {'status': 'error', 'changes': {}}
             if dns_result:
                 dns_results[service_name] = dns_result
             print("\n" + "="*60 + "\n")
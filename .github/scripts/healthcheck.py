@@ -1,10 +1,302 @@
 #!/usr/bin/env python3
-import subprocess
 import json
+import os
+import socket
+import time
 
+from budget import RunBudget, BudgetExhausted, PARTIAL_RESULT_PREFIX
+from config_loader import TLS_VERSIONS, load_config_or_exit
 
-def check_service_health(service, servers):
-    """Check health of all servers for a service"""
+
+# Parsed certificates for this run, keyed by DER fingerprint so backends
+# sharing a certificate don't parse it twice
+_cert_cache = {}
+
+# DER-encoded OIDs of the certificate fields the TLS checks read
+OID_COMMON_NAME = bytes.fromhex('550403')
+OID_ORGANIZATION = bytes.fromhex('55040a')
+OID_SUBJECT_ALT_NAME = bytes.fromhex('551d11')
+
+# DER tags
+TAG_UTC_TIME = 0x17
+TAG_VERSION = 0xa0
+TAG_EXTENSIONS = 0xa3
+TAG_DNS_NAME = 0x82
+
+
+def _der_items(data):
+    """Split DER-encoded data into its top-level [(tag, value)] items"""
+    items = []
+    pos = 0
+    while pos < len(data):
+        tag, length = data[pos], data[pos + 1]
+        pos += 2
+        if length & 0x80:
+            size = length & 0x7f
+            length = int.from_bytes(data[pos:pos + size], 'big')
+            pos += size
+        if pos + length > len(data):
+            raise ValueError("truncated DER data")
+        items.append((tag, data[pos:pos + length]))
+        pos += length
+    return items
+
+
+def _der_name(value):
+    """Map attribute OIDs to their first value in a DER-encoded Name"""
+    attributes = {}
+    for _, rdn in _der_items(value):
+        for _, attribute in _der_items(rdn):
+            (_, oid), (_, text) = _der_items(attribute)[:2]
+            attributes.setdefault(oid, text.decode('utf-8', errors='replace'))
+    return attributes
+
+
+def _der_time(tag, value):
+    """Convert a UTCTime or GeneralizedTime to epoch seconds"""
+    import calendar
+    
+    text = value.decode('ascii')
+    if tag == TAG_UTC_TIME:
+        # Two-digit years 50-99 are 19xx
+        text = ('19' if int(text[:2]) >= 50 else '20') + text
+    return calendar.timegm(time.strptime(text[:14], '%Y%m%d%H%M%S'))
+
+
+def parse_certificate(der_cert):
+    """Read the subject, issuer, expiry and DNS names of a DER certificate.
+
+    Only the fields the TLS checks use are decoded, which avoids relying on
+    private ssl module helpers to parse unverified certificates.
+    """
+    tbs_certificate = _der_items(_der_items(der_cert)[0][1])[0][1]
+    fields = _der_items(tbs_certificate)
+    if fields[0][0] == TAG_VERSION:
+        fields = fields[1:]
+    # serialNumber, signature, issuer, validity, subject, subjectPublicKeyInfo, ...extensions
+    issuer = _der_name(fields[2][1])
+    not_after = _der_time(*_der_items(fields[3][1])[1])
+    subject = _der_name(fields[4][1])
+    
+    names = []
+    for tag, value in fields[6:]:
+        if tag != TAG_EXTENSIONS:
+            continue
+        for _, extension in _der_items(_der_items(value)[0][1]):
+            parts = _der_items(extension)
+            if parts[0][1] != OID_SUBJECT_ALT_NAME:
+                continue
+            # The extension value is an OCTET STRING wrapping a sequence of GeneralNames
+            for name_tag, name in _der_items(_der_items(parts[-1][1])[0][1]):
+                if name_tag == TAG_DNS_NAME:
+                    names.append(name.decode('ascii', errors='replace'))
+    
+    return {
+        'subject': subject.get(OID_COMMON_NAME),
+        'issuer': issuer.get(OID_ORGANIZATION) or issuer.get(OID_COMMON_NAME),
+        'not_after': not_after,
+        'names': names
+    }
+
+
+def hostname_matches(hostname, names):
+    """Check hostname against certificate DNS names, allowing left-most wildcards"""
+    hostname = hostname.lower().rstrip('.')
+    for name in names:
+        name = name.lower().rstrip('.')
+        if name == hostname:
+            return True
+        if name.startswith('*.'):
+            suffix = name[1:]
+            head = hostname[:-len(suffix)] if hostname.endswith(suffix) else ''
+            if head and '.' not in head:
+                return True
+    return False
+
+
+def get_certificate_info(der_cert):
+    """Return parsed certificate details, cached for the run"""
+    import hashlib
+    
+    key = hashlib.sha256(der_cert).digest()
+    if key not in _cert_cache:
+        _cert_cache[key] = parse_certificate(der_cert)
+    return _cert_cache[key]
+
+
+def _shutdown_socket(sock):
+    try:
+        # Bypass the TLS layer so a blocked read on an SSL socket is woken up too
+        socket.socket.shutdown(sock, socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class ProbeDeadline:
+    """Absolute deadline for one probe.
+
+    Socket timeouts apply to each send and receive, so a server that sends its
+    response slowly could hold a probe far past its timeout. Every operation
+    gets the time left as its timeout, and a watchdog shuts the socket down
+    once the deadline passes.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.deadline = time.time() + timeout
+        self._timer = None
+
+    def remaining(self):
+        """Seconds left for the probe, raising socket.timeout once it is over"""
+        remaining = self.deadline - time.time()
+        if remaining <= 0:
+            raise socket.timeout(f"timed out after {self.timeout:.1f}s")
+        return remaining
+
+    def expired(self):
+        return time.time() >= self.deadline
+
+    def guard(self, sock):
+        """Shut the socket down when the deadline passes"""
+        import threading
+        
+        self._timer = threading.Timer(self.remaining(), _shutdown_socket, (sock,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def cancel(self):
+        if self._timer:
+            self._timer.cancel()
+
+
+def http_get_status(sock, hostname, port, default_port, path, deadline):
+    """Send a GET over an open connection and read the whole response before the deadline"""
+    # Imported lazily so TCP-only runs don't pay for the HTTP stack
+    import http.client
+    
+    conn = http.client.HTTPConnection(hostname, port)
+    conn.sock = sock
+    host_header = hostname if port == default_port else f"{hostname}:{port}"
+    # No single operation may outlast the probe; the watchdog bounds the total
+    sock.settimeout(deadline.remaining())
+    conn.request('GET', path, headers={'Host': host_header})
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def probe_https(hostname, ip, port, path, timeout):
+    """GET an HTTPS endpoint on a specific IP and capture TLS details.
+
+    The certificate is read from the handshake of the probe request itself,
+    so no additional connection is made. The whole probe finishes within timeout.
+    """
+    # Imported lazily so runs without HTTPS services don't pay for the TLS stack
+    import ssl
+    
+    context = ssl.create_default_context()
+    # Validity is evaluated against per-service thresholds instead of failing the handshake
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    
+    deadline = ProbeDeadline(timeout)
+    sock = socket.create_connection((ip, port), timeout=deadline.remaining())
+    try:
+        tls_sock = context.wrap_socket(sock, server_hostname=hostname, do_handshake_on_connect=False)
+    except Exception:
+        sock.close()
+        raise
+    
+    try:
+        deadline.guard(tls_sock)
+        handshake_start = time.time()
+        tls_sock.settimeout(deadline.remaining())
+        tls_sock.do_handshake()
+        handshake_time = time.time() - handshake_start
+        
+        tls_info = {
+            'protocol': tls_sock.version(),
+            'handshake_ms': round(handshake_time * 1000, 1)
+        }
+        # A certificate that can't be inspected must not fail an otherwise working server
+        try:
+            cert = get_certificate_info(tls_sock.getpeercert(binary_form=True))
+            tls_info.update({
+                'subject': cert['subject'],
+                'issuer': cert['issuer'],
+                'expires': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(cert['not_after'])),
+                'days_left': int((cert['not_after'] - time.time()) // 86400),
+                'hostname_match': hostname_matches(hostname, cert['names'])
+            })
+        except Exception as e:
+            tls_info['error'] = f"could not inspect certificate: {e}"
+        
+        return http_get_status(tls_sock, hostname, port, 443, path, deadline), tls_info
+    except Exception:
+        # Errors caused by the watchdog closing the socket are reported as the timeout
+        if deadline.expired():
+            raise socket.timeout(f"timed out after {timeout:.1f}s") from None
+        raise
+    finally:
+        deadline.cancel()
+        tls_sock.close()
+
+
+def probe_http(hostname, ip, port, path, timeout):
+    """GET a plain HTTP endpoint on a specific IP, sending the service hostname as Host.
+
+    The whole probe finishes within timeout.
+    """
+    deadline = ProbeDeadline(timeout)
+    sock = socket.create_connection((ip, port), timeout=deadline.remaining())
+    try:
+        deadline.guard(sock)
+        return http_get_status(sock, hostname, port, 80, path, deadline)
+    except Exception:
+        # Errors caused by the watchdog closing the socket are reported as the timeout
+        if deadline.expired():
+            raise socket.timeout(f"timed out after {timeout:.1f}s") from None
+        raise
+    finally:
+        deadline.cancel()
+        sock.close()
+
+
+def evaluate_tls(tls_info, thresholds):
+    """Apply per-service TLS thresholds, returning (state, problems)"""
+    failures = []
+    warnings = []
+    
+    if 'error' in tls_info:
+        warnings.append(tls_info['error'])
+    elif tls_info['days_left'] < 0:
+        failures.append(f"certificate expired {-tls_info['days_left']}d ago")
+    elif tls_info['days_left'] <= thresholds['expiry_fail_days']:
+        failures.append(f"certificate expires in {tls_info['days_left']}d")
+    elif tls_info['days_left'] <= thresholds['expiry_warn_days']:
+        warnings.append(f"certificate expires in {tls_info['days_left']}d")
+    
+    if 'error' not in tls_info and not tls_info['hostname_match'] and thresholds['hostname_mismatch'] != 'ignore':
+        problem = f"certificate does not cover hostname (CN={tls_info['subject']})"
+        (failures if thresholds['hostname_mismatch'] == 'failed' else warnings).append(problem)
+    
+    protocol = tls_info['protocol']
+    if protocol in TLS_VERSIONS and TLS_VERSIONS.index(protocol) < TLS_VERSIONS.index(thresholds['min_version']):
+        warnings.append(f"{protocol} is below {thresholds['min_version']}")
+    
+    max_handshake_ms = thresholds.get('max_handshake_ms')
+    if max_handshake_ms is not None and tls_info['handshake_ms'] > max_handshake_ms:
+        warnings.append(f"handshake took {tls_info['handshake_ms']:.0f}ms")
+    
+    if failures:
+        return 'failed', failures + warnings
+    if warnings:
+        return 'degraded', warnings
+    return 'ok', []
+
+
+def check_service_health(service, budget=None, previous_failures=frozenset()):
+    """Check health of all servers for a service, previously failing servers first"""
     print(f"📁 {service['name']}")
     print(f"   Hostname: {service['hostname']}")
     
@@ -13,66 +305,83 @@ def check_service_health(service, servers):
     if healthcheck_path:
         print(f"   Endpoint: {service['scheme']}://{service['hostname']}{healthcheck_path}")
     else:
-        port = str(service.get('port', '443' if service.get('scheme') == 'https' else '80'))
-        print(f"   TCP Port Check: {service['hostname']}:{port}")
+        print(f"   TCP Port Check: {service['hostname']}:{service['port']}")
     print()
     
     failed_count = 0
     total_count = 0
     healthy_servers = []
     failed_server_details = []
+    degraded_servers = []
+    degraded_server_details = []
+    tls_results = {}
+    tls_failures = []
+    latencies = {}
+    skipped_servers = []
+    
+    # Port is normalized by the config loader
+    port = str(service['port'])
     
-    # Resolve server references by matching name field
-    service_servers = []
-    for server_name in service.get('servers', []):
-        server_found = False
-        for server in servers:
-            if server['name'] == server_name:
-                service_servers.append(server)
-                server_found = True
-                break
-        if not server_found:
-            print(f"   ⚠️ Warning: Server '{server_name}' not found in server definitions")
-    
-    for server in service_servers:
+    # Server references are resolved by the config loader; servers that
+    # failed last run are probed first so failovers are confirmed early
+    ordered_servers = sorted(service['resolved_servers'],
+                             key=lambda s: (service['name'], s['name']) not in previous_failures)
+    
+    for server in ordered_servers:
         total_count += 1
         ip = server['ip']
         server_name = server['name']
         
-        # Use port from config, or default based on scheme
-        if 'port' in service:
-            port = str(service['port'])
-        else:
-            port = '443' if service.get('scheme') == 'https' else '80'
-        
         print(f"   {server_name} ({ip}) - ", end='', flush=True)
         
-        if healthcheck_path:
-            # HTTP/HTTPS health check
-            url = f"{service['scheme']}://{service['hostname']}{healthcheck_path}"
-            
-            # Perform healthcheck using --resolve
-            cmd = [
-                'curl', '-s', '-o', '/dev/null', '-w', '%{http_code}',
-                '--resolve', f"{service['hostname']}:{port}:{ip}",
-                '-X', 'GET', url,
-                '--max-time', '10'
-            ]
-            
-            # Add --insecure only for https
-            if service.get('scheme') == 'https':
-                cmd.append('--insecure')
-            
+        # Never start a probe that could run past the stage deadline
+        try:
+            timeout = budget.timeout(service['timeout']) if budget else service['timeout']
+        except BudgetExhausted:
+            print("⏭️ Skipped (run budget exhausted)")
+            skipped_servers.append(server_name)
+            continue
+        
+        if healthcheck_path and service['scheme'] == 'https':
+            # HTTPS health check, capturing the certificate from the same handshake
             try:
-                response = subprocess.run(cmd, capture_output=True, text=True)
-                status_code = response.stdout.strip()
+                start_time = time.time()
+                status_code, tls_info = probe_https(service['hostname'], ip, int(port),
+                                                    healthcheck_path, timeout)
+                latencies[server_name] = round((time.time() - start_time) * 1000, 1)
+                tls_results[server_name] = tls_info
+                tls_state, tls_problems = evaluate_tls(tls_info, service['tls'])
+                tls_summary = f"{tls_info['protocol']}, cert {tls_info.get('days_left', '?')}d"
                 
-                if response.returncode != 0:
-                    error_detail = response.stderr or "Connection failed"
-                    print(f"❌ Failed ({error_detail})")
+                if status_code != 200:
+                    print(f"❌ Failed (HTTP {status_code})")
                     failed_count += 1
-                    failed_server_details.append({'server': server_name, 'ip': ip, 'error': error_detail})
-                elif status_code == '200':
+                    failed_server_details.append({'server': server_name, 'ip': ip, 'error': f'HTTP {status_code}'})
+                elif tls_state == 'failed':
+                    # Counted once all servers are checked, see below
+                    error_detail = f"TLS: {'; '.join(tls_problems)}"
+                    print(f"❌ Failed ({error_detail})")
+                    tls_failures.append({'server': server_name, 'ip': ip, 'error': error_detail})
+                elif tls_state == 'degraded':
+                    print(f"⚠️ Degraded (HTTP {status_code}, {tls_summary}: {'; '.join(tls_problems)})")
+                    healthy_servers.append(server_name)
+                    degraded_servers.append(server_name)
+                    degraded_server_details.append({'server': server_name, 'ip': ip, 'warning': f"TLS: {'; '.join(tls_problems)}"})
+                else:
+                    print(f"✅ Healthy (HTTP {status_code}, {tls_summary})")
+                    healthy_servers.append(server_name)
+            except Exception as e:
+                print(f"❌ Error: {str(e)}")
+                failed_count += 1
+                failed_server_details.append({'server': server_name, 'ip': ip, 'error': str(e)})
+        elif healthcheck_path:
+            # HTTP health check
+            try:
+                start_time = time.time()
+                status_code = probe_http(service['hostname'], ip, int(port), healthcheck_path, timeout)
+                latencies[server_name] = round((time.time() - start_time) * 1000, 1)
+                
+                if status_code == 200:
                     print(f"✅ Healthy (HTTP {status_code})")
                     healthy_servers.append(server_name)
                 else:
@@ -85,15 +394,13 @@ def check_service_health(service, servers):
                 failed_server_details.append({'server': server_name, 'ip': ip, 'error': str(e)})
         else:
             # TCP port check only
-            import socket
-            import time
-            
             try:
                 sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(10)
+                sock.settimeout(timeout)
                 start_time = time.time()
                 result = sock.connect_ex((ip, int(port)))
                 response_time = time.time() - start_time
+                latencies[server_name] = round(response_time * 1000, 1)
                 sock.close()
                 
                 if result == 0:
@@ -112,29 +419,99 @@ def check_service_health(service, servers):
                 failed_count += 1
                 failed_server_details.append({'server': server_name, 'ip': ip, 'error': str(e)})
     
+    # Backends often share one certificate, so it expires on all of them at once.
+    # Rather than emptying the record set, keep TLS-only failures in DNS as
+    # degraded when no server passed. They still count as failures.
+    if tls_failures and not healthy_servers:
+        print(f"\n   ⚠️ No server passed; keeping {len(tls_failures)} server(s) with TLS failures in DNS")
+        for detail in tls_failures:
+            healthy_servers.append(detail['server'])
+            degraded_servers.append(detail['server'])
+            detail['error'] += ' (kept in DNS: no server passed)'
+            detail['kept'] = True
+    failed_count += len(tls_failures)
+    failed_server_details.extend(tls_failures)
+    
     print()
-    print(f"Summary for {service['name']}: {total_count - failed_count}/{total_count} healthy")
+    summary = f"Summary for {service['name']}: {len(healthy_servers)}/{total_count} healthy"
+    if degraded_servers:
+        summary += f" ({len(degraded_servers)} degraded)"
+    if skipped_servers:
+        summary += f" ({len(skipped_servers)} not checked)"
+    print(summary)
     
     return {
         'healthy_servers': healthy_servers,
         'failed_count': failed_count,
         'total_count': total_count,
-        'failed_server_details': failed_server_details
+        'failed_server_details': failed_server_details,
+        'degraded_servers': degraded_servers,
+        'degraded_server_details': degraded_server_details,
+        'tls': tls_results,
+        'latency_ms': latencies,
+        'skipped_servers': skipped_servers
     }
 
 
+def load_previous_failures(config, log_dir='logs'):
+    """Return (service, server) pairs that failed in the previous run.
+
+    The notifier's state is persisted between workflow runs, so it is read
+    first. Local health check logs are the fallback when there is none.
+    """
+    try:
+        with open(config['notifications']['state_path'], 'r') as f:
+            servers = json.load(f)['servers']
+        return {tuple(key.split('/', 1)) for key, state in servers.items() if state == 'failed'}
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    
+    try:
+        log_files = sorted(f for f in os.listdir(log_dir) if f.startswith('healthcheck-') and f.endswith('.log'))
+    except OSError:
+        log_files = []
+    if not log_files:
+        print("ℹ️ No previous run state found; checking servers in config order\n")
+        return set()
+    
+    with open(os.path.join(log_dir, log_files[-1]), 'r') as f:
+        lines = f.read().splitlines()
+    
+    # The last run is the last summary line and the detail lines after it
+    failures = set()
+    for line in reversed(lines):
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if entry.get('type') == 'summary':
+            break
+        if entry.get('type') == 'failure':
+            failures.add((entry.get('svc'), entry.get('server')))
+    return failures
+
+
+def service_priority(service, previous_failures):
+    """Sort key: DNS-managed services first, then services with recent failures"""
+    has_failures = any((service['name'], server['name']) in previous_failures
+                       for server in service['resolved_servers'])
+    return (not service['cloudflare']['update_dns'], not has_failures)
+
+
 if __name__ == "__main__":
     # Read config
-    with open('.github/ha-monitor-config.json', 'r') as f:
-        config = json.load(f)
+    config = load_config_or_exit()
+    
+    budget = RunBudget.from_env(config, 'healthcheck')
+    previous_failures = load_previous_failures(config)
     
-    # Process all services
+    # Process all services, most important first so a tight budget cuts the rest
     results = {}
-    servers = config.get('servers', [])
-    for service in config.get('services', []):
+    for service in sorted(config['services'], key=lambda svc: service_priority(svc, previous_failures)):
         service_name = service['name']
-        results[service_name] = check_service_health(service, servers)
+        results[service_name] = check_service_health(service, budget, previous_failures)
         print("\n" + "="*60 + "\n")
+        print(PARTIAL_RESULT_PREFIX + json.dumps({service_name: results[service_name]}), flush=True)
     
     # Output results as JSON for other scripts
     print(json.dumps(results))
\ No newline at end of file
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+import json as json_module
+
+
+class Response:
+    """Minimal response object with the parts of the requests API the scripts use"""
+
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.content = body
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json_module.loads(self.content)
+
+
+def request(method, url, headers=None, params=None, json=None, timeout=None):
+    """Send an HTTP request using only the standard library.
+
+    Like requests, HTTP error statuses are returned rather than raised;
+    connection errors and timeouts raise OSError.
+    """
+    # urllib.request pulls in ssl and email; only pay for it when a request is made
+    import urllib.error
+    import urllib.parse
+    import urllib.request
+    
+    if params:
+        url = f"{url}?{urllib.parse.urlencode(params)}"
+    data = None
+    headers = dict(headers or {})
+    if json is not None:
+        data = json_module.dumps(json).encode()
+        headers.setdefault('Content-Type', 'application/json')
+
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return Response(response.status, response.read())
+    except urllib.error.HTTPError as e:
+        return Response(e.code, e.read())
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request('PUT', url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request('DELETE', url, **kwargs)
@@ -4,10 +4,15 @@ import json
 import base64
 from datetime import datetime
 
+from budget import RunBudget, call_timeout
+from config_loader import load_config_or_exit
+import http_client
 
-def log_results(config, health_results, dns_results):
-    # Import requests here to avoid import errors when module is loaded
-    import requests
+# Upper bound for a single GitHub API call
+API_TIMEOUT = 30
+
+
+def log_results(config, health_results, dns_results, budget=None):
     """Log results to repository"""
     if not config.get('logging', {}).get('enabled', False):
         return
@@ -48,13 +53,38 @@ def log_results(config, health_results, dns_results):
             
             # Detailed logs for failures
             for failed_server in health_result.get('failed_server_details', []):
-                detailed_logs.append({
+                failure_log = {
                     'ts': datetime.utcnow().isoformat() + 'Z',
                     'type': 'failure',
                     'svc': service_name,
                     'server': failed_server.get('server'),
                     'ip': failed_server.get('ip'),
                     'error': failed_server.get('error')
+                }
+                # Failed but left in DNS because no server passed
+                if failed_server.get('kept'):
+                    failure_log['kept'] = True
+                detailed_logs.append(failure_log)
+            
+            # Servers the run budget left unchecked, so replays keep them out of the healthy set
+            for skipped_server in health_result.get('skipped_servers', []):
+                detailed_logs.append({
+                    'ts': datetime.utcnow().isoformat() + 'Z',
+                    'type': 'skipped',
+                    'svc': service_name,
+                    'server': skipped_server
+                })
+            
+            # Detailed logs for degraded servers (e.g. expiring certificates)
+            for degraded_server in health_result.get('degraded_server_details', []):
+                detailed_logs.append({
+                    'ts': datetime.utcnow().isoformat() + 'Z',
+                    'type': 'degraded',
+                    'svc': service_name,
+                    'server': degraded_server.get('server'),
+                    'ip': degraded_server.get('ip'),
+                    'warning': degraded_server.get('warning'),
+                    'tls': health_result.get('tls', {}).get(degraded_server.get('server'))
                 })
             
             # Detailed logs for DNS events
@@ -70,17 +100,22 @@ def log_results(config, health_results, dns_results):
                         'healthy_ips': dns_result['changes'].get('target', []),
                         'update_disabled': True
                     })
-                elif dns_result['status'] == 'updated' and dns_result.get('changes'):
-                    detailed_logs.append({
+                elif dns_result['status'] in ('updated', 'partial') and dns_result.get('changes'):
+                    changes = dns_result['changes']
+                    log_entry = {
                         'ts': datetime.utcnow().isoformat() + 'Z',
-                        'type': 'dns_updated',
+                        'type': 'dns_updated' if dns_result['status'] == 'updated' else 'dns_partial',
                         'svc': service_name,
                         'host': service['hostname'],
-                        'previous': dns_result['changes'].get('previous', []),
-                        'current': dns_result['changes'].get('target', []),
-                        'removed': dns_result['changes'].get('removed', []),
-                        'added': dns_result['changes'].get('added', [])
-                    })
+                        'previous': changes.get('previous', []),
+                        'current': changes.get('current', changes.get('target', [])),
+                        'removed': changes.get('removed', []),
+                        'added': changes.get('added', [])
+                    }
+                    if changes.get('failed'):
+                        log_entry['target'] = changes.get('target', [])
+                        log_entry['failed'] = changes['failed']
+                    detailed_logs.append(log_entry)
         
         # Use daily log file
         timestamp = datetime.utcnow()
@@ -114,7 +149,7 @@ def log_results(config, health_results, dns_results):
         # First check if directory exists
         dir_path = "logs"
         dir_api_url = f"https://api.github.com/repos/{repo}/contents/{dir_path}"
-        dir_check = requests.get(dir_api_url, headers=headers)
+        dir_check = http_client.get(dir_api_url, headers=headers, timeout=call_timeout(budget, API_TIMEOUT))
         
         # If directory doesn't exist, create a .gitkeep file to establish it
         if dir_check.status_code == 404:
@@ -125,13 +160,13 @@ def log_results(config, health_results, dns_results):
                 'branch': 'main'
             }
             gitkeep_url = f"https://api.github.com/repos/{repo}/contents/{dir_path}/.gitkeep"
-            create_response = requests.put(gitkeep_url, headers=headers, json=gitkeep_data)
+            create_response = http_client.put(gitkeep_url, headers=headers, json=gitkeep_data, timeout=call_timeout(budget, API_TIMEOUT))
             if create_response.status_code not in [200, 201]:
                 print(f"   ⚠️  Failed to create directory: {create_response.status_code} - {create_response.text}")
         
         # Get current file if it exists
         api_url = f"https://api.github.com/repos/{repo}/contents/{log_path}"
-        existing_file = requests.get(api_url, headers=headers)
+        existing_file = http_client.get(api_url, headers=headers, timeout=call_timeout(budget, API_TIMEOUT))
         
         # Prepare content
         if existing_file.status_code == 200:
@@ -156,7 +191,7 @@ def log_results(config, health_results, dns_results):
             data['sha'] = sha
         
         # Push the file
-        response = requests.put(api_url, headers=headers, json=data)
+        response = http_client.put(api_url, headers=headers, json=data, timeout=call_timeout(budget, API_TIMEOUT))
         
         if response.status_code in [200, 201]:
             print(f"✅ Logged results to {log_path}")
@@ -174,8 +209,7 @@ if __name__ == "__main__":
     import sys
     
     # Read config
-    with open('.github/ha-monitor-config.json', 'r') as f:
-        config = json.load(f)
+    config = load_config_or_exit()
     
     # Read results from stdin
     data = json.loads(sys.stdin.read())
@@ -183,4 +217,4 @@ if __name__ == "__main__":
     dns_results = data['dns_results']
     
     # Log results
-    log_results(config, health_results, dns_results)
\ No newline at end of file
+    log_results(config, health_results, dns_results, RunBudget.from_env(config, 'logging'))
\ No newline at end of file
@@ -3,56 +3,154 @@ import json
 import subprocess
 import sys
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from budget import RunBudget, MIN_CALL_SECONDS, PARTIAL_RESULT_PREFIX
+from config_loader import load_config_or_exit
+
+# Extra time a stage script gets past its deadline to print results and exit
+STAGE_GRACE_SECONDS = 5
+
+
+def decode_output(output):
+    # TimeoutExpired carries the raw bytes read so far
+    if isinstance(output, bytes):
+        return output.decode('utf-8', errors='replace')
+    return output or ''
+
+
+def run_stage(script, stage, budget, input_data=None, profiler=None, background=False):
+    """Run a stage script within its share of the run budget.
+
+    Returns the completed process, or None if the stage was skipped because
+    the budget ran out. A stage killed at its deadline is returned with
+    returncode None and the output it printed before that.
+    """
+    remaining = budget.deadline_for(stage) - time.time()
+    if remaining < MIN_CALL_SECONDS:
+        return None
+    command = profiler.command(script) if profiler else ['python3', script]
+    if profiler:
+        profiler.start(stage, background)
+    try:
+        process = subprocess.run(
+            command,
+            input=input_data,
+            capture_output=True,
+            text=True,
+            env=budget.env(stage),
+            timeout=remaining + STAGE_GRACE_SECONDS
+        )
+    except subprocess.TimeoutExpired as e:
+        process = subprocess.CompletedProcess(command, None, decode_output(e.stdout), decode_output(e.stderr))
+    if profiler:
+        profiler.record_process(stage, process)
+    return process
+
+
+def stage_finished(process):
+    """Whether a stage ran to completion within the budget"""
+    return process is not None and process.returncode is not None
+
+
+def partial_health_results(config, output_lines):
+    """Health results of an unfinished health check stage.
+
+    Services it finished keep their results; every server of the others is
+    marked as not checked, so DNS keeps their current records.
+    """
+    results = {}
+    for line in output_lines:
+        if line.startswith(PARTIAL_RESULT_PREFIX):
+            try:
+                results.update(json.loads(line[len(PARTIAL_RESULT_PREFIX):]))
+            except json.JSONDecodeError:
+                # Cut off when the stage was killed
+                continue
+    for service in config['services']:
+        if service['name'] not in results:
+            server_names = [server['name'] for server in service['resolved_servers']]
+            results[service['name']] = {
+                'healthy_servers': [],
+                'failed_count': 0,
+                'total_count': len(server_names),
+                'failed_server_details': [],
+                'degraded_servers': [],
+                'degraded_server_details': [],
+                'tls': {},
+                'latency_ms': {},
+                'skipped_servers': server_names
+            }
+    return results
 
 
 def main():
     """Main orchestrator for HA Monitor"""
-    # Read config
-    with open('.github/ha-monitor-config.json', 'r') as f:
-        config = json.load(f)
+    # Startup profiling: per-stage wall time and import time (-X importtime)
+    profiler = None
+    if '--profile' in sys.argv[1:] or os.environ.get('HA_PROFILE') == '1':
+        from startup_profile import StartupProfile
+        profiler = StartupProfile()
+        profiler.start('config')
+    
+    # Read and validate config before any probes run
+    config = load_config_or_exit()
+    budget = RunBudget.from_config(config)
+    if profiler:
+        profiler.stop('config')
+    unfinished = []
     
     # Step 1: Health checks
     print("=== Running Health Checks ===\n")
-    health_process = subprocess.run(
-        ['python3', '.github/scripts/healthcheck.py'],
-        capture_output=True,
-        text=True
-    )
+    health_process = run_stage('.github/scripts/healthcheck.py', 'healthcheck', budget, profiler=profiler)
     
     # Extract JSON from output (last line)
-    health_output_lines = health_process.stdout.strip().split('\n')
-    
-    # Debug: Check if we have output
-    if not health_output_lines or len(health_output_lines) == 0:
-        print("ERROR: No output from health check script")
-        sys.exit(1)
+    health_output_lines = health_process.stdout.strip().split('\n') if health_process else []
     
-    try:
-        health_results = json.loads(health_output_lines[-1])
-    except json.JSONDecodeError as e:
-        print(f"ERROR: Failed to parse health check JSON: {e}")
-        print(f"Last line was: {health_output_lines[-1]}")
-        sys.exit(1)
+    if not stage_finished(health_process):
+        # DNS is still reconciled from the checks that completed
+        for line in health_output_lines:
+            if not line.startswith(PARTIAL_RESULT_PREFIX):
+                print(line)
+        print("\n⏭️ Health check script exceeded the run budget; unfinished servers are treated as not checked")
+        health_results = partial_health_results(config, health_output_lines)
+    else:
+        # Debug: Check if we have output
+        if not health_output_lines or len(health_output_lines) == 0:
+            print("ERROR: No output from health check script")
+            sys.exit(1)
+        
+        try:
+            health_results = json.loads(health_output_lines[-1])
+        except json.JSONDecodeError as e:
+            print(f"ERROR: Failed to parse health check JSON: {e}")
+            print(f"Last line was: {health_output_lines[-1]}")
+            sys.exit(1)
+        
+        # Print health check output (except JSON and partial result lines)
+        for line in health_output_lines[:-1]:
+            if not line.startswith(PARTIAL_RESULT_PREFIX):
+                print(line)
     
-    # Print health check output (except JSON line)
-    for line in health_output_lines[:-1]:
-        print(line)
+    for service_name, result in health_results.items():
+        if result.get('skipped_servers'):
+            unfinished.append(f"{service_name}: {len(result['skipped_servers'])} server(s) not checked")
     
-    # Step 2: DNS updates
+    # Step 2: DNS updates (always reconciled from whatever checks completed)
     print("\n=== Checking/Updating DNS ===")
-    dns_process = subprocess.run(
-        ['python3', '.github/scripts/dns_update.py'],
-        input=json.dumps(health_results),
-        capture_output=True,
-        text=True
-    )
-    
-    if dns_process.returncode != 0:
+    dns_process = run_stage('.github/scripts/dns_update.py', 'dns', budget, json.dumps(health_results),
+                             profiler=profiler)
+    
+    if not stage_finished(dns_process):
+        print("DNS update script exceeded the run budget")
+        unfinished.append("DNS reconciliation did not finish")
+    elif dns_process.returncode != 0:
         print(f"DNS update script failed with error:\n{dns_process.stderr}")
         sys.exit(1)
     
     # Extract JSON from output (last line if exists)
-    dns_output_lines = dns_process.stdout.strip().split('\n') if dns_process.stdout else []
+    dns_output_lines = dns_process.stdout.strip().split('\n') if dns_process and dns_process.stdout else []
     dns_results = {}
     if dns_output_lines and dns_output_lines[-1].startswith('{'):
         dns_results = json.loads(dns_output_lines[-1])
@@ -64,41 +162,74 @@ def main():
         for line in dns_output_lines:
             print(line)
     
+    for service_name, result in dns_results.items():
+        if result.get('status') == 'skipped':
+            unfinished.append(f"{service_name}: DNS not reconciled")
+    
     # Combine results for logging and dashboard
     combined_results = {
         'health_results': health_results,
         'dns_results': dns_results
     }
     
+    # Notifications are sent in the background so slow endpoints never hold up the run
+    executor = ThreadPoolExecutor(max_workers=1)
+    notify_future = None
+    if config['notifications']['enabled']:
+        notify_future = executor.submit(run_stage, '.github/scripts/notify.py', 'notify', budget,
+                                        json.dumps(combined_results), profiler, background=True)
+    
     # Step 3: Logging
     if config.get('logging', {}).get('enabled', False):
-        logging_process = subprocess.run(
-            ['python3', '.github/scripts/log_results.py'],
-            input=json.dumps(combined_results),
-            capture_output=True,
-            text=True
-        )
-        if logging_process.returncode != 0:
+        logging_process = run_stage('.github/scripts/log_results.py', 'logging', budget,
+                                    json.dumps(combined_results), profiler)
+        if not stage_finished(logging_process):
+            unfinished.append("Logging skipped")
+        elif logging_process.returncode != 0:
             print(f"Logging script failed with error:\n{logging_process.stderr}")
             sys.exit(1)
-        print(logging_process.stdout)
+        else:
+            print(logging_process.stdout)
     
     # Step 4: Dashboard generation
     print("\n=== Generating Dashboard ===")
-    dashboard_process = subprocess.run(
-        ['python3', '.github/scripts/dashboard.py'],
-        input=json.dumps(combined_results),
-        capture_output=True,
-        text=True
-    )
-    if dashboard_process.returncode != 0:
+    dashboard_process = run_stage('.github/scripts/dashboard.py', 'dashboard', budget,
+                                  json.dumps(combined_results), profiler)
+    if not stage_finished(dashboard_process):
+        unfinished.append("Dashboard skipped")
+    elif dashboard_process.returncode != 0:
         print(f"Dashboard script failed with error:\n{dashboard_process.stderr}")
         sys.exit(1)
-    print(dashboard_process.stdout)
+    else:
+        print(dashboard_process.stdout)
+    
+    # Collect notification results
+    if notify_future is not None:
+        print("\n=== Notifications ===")
+        notify_process = notify_future.result()
+        if not stage_finished(notify_process):
+            unfinished.append("Notifications did not finish")
+        elif notify_process.returncode != 0:
+            print(f"Notification script failed with error:\n{notify_process.stderr}")
+        else:
+            print(notify_process.stdout)
+    executor.shutdown()
+    
+    # Report work the run budget did not allow
+    if unfinished:
+        print(f"::warning title=Run Budget Exhausted::{'; '.join(unfinished)}")
+    
+    if profiler:
+        profiler.report()
     
     # Check if any health checks failed
     any_failed = any(result['failed_count'] > 0 for result in health_results.values())
     
+    # Surface degraded servers (e.g. expiring certificates) as workflow warnings
+    for service_name, result in health_results.items():
+        for degraded in result.get('degraded_server_details', []):
+            print(f"::warning title=Server Degraded::{service_name}/{degraded['server']} ({degraded['ip']}): {degraded['warning']}")
+    
     # Check for no healthy IPs warnings
     for service_name, result in health_results.items():
         # Find service by name in the list
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+from datetime import datetime
+
+from budget import RunBudget, call_timeout
+from config_loader import load_config_or_exit
+import http_client
+
+# Undelivered transitions kept for the next run; older ones are dropped beyond this
+MAX_PENDING = 50
+
+
+def server_states(config, health_results):
+    """Map 'service/server' to its state for this run, leaving out unchecked servers"""
+    states = {}
+    for service in config['services']:
+        result = health_results.get(service['name'])
+        if not result:
+            continue
+        for server in service['resolved_servers']:
+            if server['name'] in result.get('skipped_servers', []):
+                continue
+            if server['name'] in result.get('degraded_servers', []):
+                state = 'degraded'
+            elif server['name'] in result.get('healthy_servers', []):
+                state = 'healthy'
+            else:
+                state = 'failed'
+            states[f"{service['name']}/{server['name']}"] = state
+    return states
+
+
+def find_transitions(config, previous, health_results, dns_results):
+    """Compare this run with the previous one and return the state transitions"""
+    transitions = []
+    current_states = server_states(config, health_results)
+    previous_states = previous.get('servers', {})
+    errors = {}
+    for service_name, result in health_results.items():
+        for detail in result.get('failed_server_details', []):
+            errors[f"{service_name}/{detail['server']}"] = detail.get('error')
+        for detail in result.get('degraded_server_details', []):
+            errors[f"{service_name}/{detail['server']}"] = detail.get('warning')
+
+    for key, state in current_states.items():
+        old_state = previous_states.get(key)
+        # The first run only records a baseline
+        if old_state is None or old_state == state:
+            continue
+        service_name, server_name = key.split('/', 1)
+        transitions.append({
+            'kind': 'health',
+            'svc': service_name,
+            'server': server_name,
+            'from': old_state,
+            'to': state,
+            'detail': errors.get(key)
+        })
+
+    for service_name, dns_result in dns_results.items():
+        old_status = previous.get('dns', {}).get(service_name)
+        status = dns_result.get('status')
+        changes = dns_result.get('changes', {})
+        if status in ('updated', 'partial'):
+            # Every DNS change is worth reporting, keyed by the resulting record set
+            detail = f"removed {changes.get('removed', [])}, added {changes.get('added', [])}"
+            if changes.get('failed'):
+                detail += f", not applied {changes['failed']}"
+            transitions.append({
+                'kind': 'dns',
+                'svc': service_name,
+                'from': old_status,
+                'to': status,
+                'target': changes.get('current', changes.get('target', [])),
+                'detail': detail
+            })
+        elif (status == 'mismatch' and old_status not in (None, 'mismatch')) or \
+                (status == 'ok' and old_status == 'mismatch'):
+            # A mismatch appearing, or one being resolved outside the monitor
+            transitions.append({
+                'kind': 'dns',
+                'svc': service_name,
+                'from': old_status,
+                'to': status,
+                'target': changes.get('target', []),
+                'detail': None
+            })
+
+    return transitions, current_states
+
+
+def dedupe_key(transition):
+    """Key that identifies a repeat of the same transition"""
+    if transition['kind'] == 'dns':
+        return f"dns:{transition['svc']}:{transition['to']}:{','.join(transition['target'])}"
+    return f"health:{transition['svc']}:{transition['server']}:{transition['to']}"
+
+
+def format_message(transitions):
+    """Group all transitions of a run into one subject and text body"""
+    subject = f"[ActionsHA] {len(transitions)} state change(s)"
+    lines = []
+    for transition in transitions:
+        if transition['kind'] == 'health':
+            line = f"{transition['svc']}/{transition['server']}: {transition['from']} -> {transition['to']}"
+        else:
+            line = f"{transition['svc']} DNS: {transition['from'] or 'unknown'} -> {transition['to']}"
+        if transition.get('detail'):
+            line += f" ({transition['detail']})"
+        if transition.get('detected'):
+            line += f" [detected {transition['detected']}]"
+        lines.append(line)
+    return subject, '\n'.join(lines)
+
+
+def send_webhook(sink, subject, text, transitions, timeout):
+    """POST the grouped message as JSON"""
+    url = sink.get('url') or os.environ.get(sink.get('url_env', ''), '')
+    if not url:
+        raise ValueError("webhook sink has no url")
+    payload = {
+        'text': f"{subject}\n{text}",
+        'transitions': transitions,
+        'run': os.environ.get('GITHUB_RUN_ID', 'unknown')
+    }
+    response = http_client.post(url, headers=sink.get('headers', {}), json=payload, timeout=timeout)
+    if not 200 <= response.status_code < 300:
+        raise OSError(f"webhook returned {response.status_code}: {response.text[:200]}")
+
+
+def send_email(sink, subject, text, transitions, timeout):
+    """Send the grouped message through an SMTP relay"""
+    import smtplib
+    from email.message import EmailMessage
+    
+    message = EmailMessage()
+    message['Subject'] = subject
+    message['From'] = sink['from']
+    message['To'] = ', '.join(sink['to'])
+    message.set_content(text)
+    with smtplib.SMTP(sink.get('host', 'localhost'), sink.get('port', 25), timeout=timeout) as smtp:
+        smtp.send_message(message)
+
+
+def send_file(sink, subject, text, transitions, timeout):
+    """Append the grouped message as one JSON line"""
+    with open(sink['path'], 'a') as f:
+        f.write(json.dumps({
+            'ts': datetime.utcnow().isoformat() + 'Z',
+            'subject': subject,
+            'transitions': transitions
+        }, separators=(',', ':')) + '\n')
+
+
+SINKS = {
+    'webhook': send_webhook,
+    'email': send_email,
+    'file': send_file
+}
+
+
+def load_state(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(path, state):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def send_notifications(config, health_results, dns_results, budget=None):
+    """Notify every sink about state transitions since the previous run"""
+    notify_config = config['notifications']
+    if not notify_config['enabled']:
+        return
+
+    print("\n🔔 Checking for state transitions...")
+
+    previous = load_state(notify_config['state_path'])
+    transitions, current_states = find_transitions(config, previous, health_results, dns_results)
+
+    # Servers that were not checked keep their last known state
+    servers = dict(previous.get('servers', {}))
+    servers.update(current_states)
+    dns = dict(previous.get('dns', {}))
+    dns.update({name: result.get('status') for name, result in dns_results.items()
+                if result.get('status') not in ('skipped', 'error')})
+
+    # Drop repeats still inside the cooldown window
+    now = time.time()
+    cooldown = notify_config['cooldown_minutes'] * 60
+    sent = {key: ts for key, ts in previous.get('sent', {}).items() if now - ts < cooldown}
+    fresh = [transition for transition in transitions if dedupe_key(transition) not in sent]
+
+    if len(fresh) < len(transitions):
+        print(f"   ⏸️  {len(transitions) - len(fresh)} repeated transition(s) suppressed by cooldown")
+
+    # Transitions no sink received last run go out first
+    pending = previous.get('pending', [])
+    if pending:
+        print(f"   🔁 Retrying {len(pending)} undelivered transition(s)")
+    fresh = pending + fresh
+
+    if fresh:
+        subject, text = format_message(fresh)
+        print(f"   {subject}")
+        for line in text.split('\n'):
+            print(f"      {line}")
+
+        # Send to all sinks in parallel so one slow endpoint doesn't hold up the others
+        from concurrent.futures import ThreadPoolExecutor, wait
+        
+        timeout = call_timeout(budget, notify_config['timeout_seconds'])
+        executor = ThreadPoolExecutor(max_workers=len(notify_config['sinks']) or 1)
+        futures = {
+            executor.submit(SINKS[sink['type']], sink, subject, text, fresh, timeout): sink
+            for sink in notify_config['sinks']
+        }
+        done, not_done = wait(futures, timeout=timeout + 1)
+        executor.shutdown(wait=False)
+
+        delivered = False
+        for future, sink in futures.items():
+            if future in not_done:
+                print(f"   ❌ {sink['type']} notification timed out")
+            elif future.exception():
+                print(f"   ❌ {sink['type']} notification failed: {future.exception()}")
+            else:
+                print(f"   ✅ Sent {sink['type']} notification")
+                delivered = True
+
+        # Only start the cooldown once a message actually went out
+        if delivered:
+            for transition in fresh:
+                sent[dedupe_key(transition)] = now
+            pending = []
+        elif notify_config['sinks']:
+            # States still advance, so keep the transitions themselves to send next run
+            detected = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+            pending = [dict(transition, detected=transition.get('detected', detected))
+                       for transition in fresh][-MAX_PENDING:]
+        else:
+            pending = []
+    else:
+        print("   No new transitions")
+
+    save_state(notify_config['state_path'], {'servers': servers, 'dns': dns, 'sent': sent, 'pending': pending})
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Read config
+    config = load_config_or_exit()
+
+    # Read results from stdin
+    data = json.loads(sys.stdin.read())
+    health_results = data['health_results']
+    dns_results = data['dns_results']
+
+    # Send notifications
+    send_notifications(config, health_results, dns_results, RunBudget.from_env(config, 'notify'))
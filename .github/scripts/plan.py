@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Offline DNS planning and replay for HA Monitor.
+
+    plan.py plan --health results.json --dns snapshot.json
+    plan.py replay --dns snapshot.json logs/healthcheck-*.log
+    plan.py snapshot > snapshot.json
+
+`plan` and `replay` never touch the network; `snapshot` reads the current
+A records from Cloudflare so they can be planned against offline.
+"""
+import os
+import sys
+import json
+import argparse
+
+from config_loader import CONFIG_PATH, load_config_or_exit
+from dns_update import plan_dns_changes, fetch_dns_records
+
+
+def managed_services(config):
+    """Services whose DNS records the monitor checks"""
+    if not config['cloudflare'].get('enabled', False):
+        return []
+    return [service for service in config['services'] if service['cloudflare'].get('zone_id')]
+
+
+def runs_from_log(lines, config):
+    """Rebuild health results from healthcheck log lines, one entry per run.
+
+    Logs only record failed and unchecked servers, so every other server of
+    a logged service is treated as healthy.
+    """
+    services = {service['name']: service for service in config['services']}
+    runs = []
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+        if entry.get('type') == 'summary':
+            health_results = {}
+            for item in entry.get('data', []):
+                service = services.get(item['svc'])
+                if not service:
+                    continue
+                health_results[item['svc']] = {
+                    'healthy_servers': [server['name'] for server in service['resolved_servers']],
+                    'failed_count': 0,
+                    'degraded_servers': [],
+                    'skipped_servers': []
+                }
+            runs.append({'ts': entry.get('ts'), 'health_results': health_results})
+        elif runs and entry.get('svc') in runs[-1]['health_results']:
+            result = runs[-1]['health_results'][entry['svc']]
+            if entry.get('type') == 'failure' and entry.get('kept'):
+                result['degraded_servers'].append(entry.get('server'))
+                result['failed_count'] += 1
+            elif entry.get('type') == 'failure' and entry.get('server') in result['healthy_servers']:
+                result['healthy_servers'].remove(entry['server'])
+                result['failed_count'] += 1
+            elif entry.get('type') == 'skipped' and entry.get('server') in result['healthy_servers']:
+                result['healthy_servers'].remove(entry['server'])
+                result['skipped_servers'].append(entry['server'])
+            elif entry.get('type') == 'degraded':
+                result['degraded_servers'].append(entry.get('server'))
+    return runs
+
+
+def load_runs(path, config):
+    """Load recorded runs from a log file, a captured result or a JSONL of captured results"""
+    with open(path, 'r') as f:
+        content = f.read()
+
+    try:
+        data = json.loads(content)
+        documents = [data]
+    except json.JSONDecodeError:
+        documents = []
+        for line in content.splitlines():
+            if line.strip():
+                documents.append(json.loads(line))
+
+    if documents and documents[0].get('type') == 'summary':
+        return runs_from_log(content.splitlines(), config)
+
+    runs = []
+    for document in documents:
+        # Accept both the combined results passed between stages and bare health results
+        health_results = document.get('health_results', document)
+        runs.append({'ts': document.get('ts'), 'health_results': health_results})
+    return runs
+
+
+def plan_run(config, health_results, dns_records):
+    """Compute the DNS change set every managed service would get for one run"""
+    plans = {}
+    for service in managed_services(config):
+        result = health_results.get(service['name'])
+        if result is None:
+            continue
+        plan = plan_dns_changes(service, result.get('healthy_servers', []),
+                                dns_records.get(service['hostname'], []),
+                                result.get('skipped_servers', []))
+        if not plan['removed'] and not plan['added']:
+            status = 'ok'
+        elif service['cloudflare']['update_dns']:
+            status = 'updated'
+        else:
+            status = 'mismatch'
+        plans[service['name']] = dict(plan, hostname=service['hostname'], status=status)
+    return plans
+
+
+def replay(config, runs, dns_records):
+    """Run recorded runs through the DNS selection logic, applying each plan in turn"""
+    dns_records = {hostname: list(ips) for hostname, ips in dns_records.items()}
+    stats = {
+        service['name']: {'runs': 0, 'updates': 0, 'added': 0, 'removed': 0,
+                          'flaps': 0, 'empty': 0, 'mismatches': 0}
+        for service in managed_services(config)
+    }
+    removed_before = {name: set() for name in stats}
+
+    for run in runs:
+        for service_name, plan in plan_run(config, run['health_results'], dns_records).items():
+            service_stats = stats[service_name]
+            service_stats['runs'] += 1
+            if not plan['target']:
+                service_stats['empty'] += 1
+            if plan['status'] == 'mismatch':
+                service_stats['mismatches'] += 1
+            elif plan['status'] == 'updated':
+                service_stats['updates'] += 1
+                service_stats['added'] += len(plan['added'])
+                service_stats['removed'] += len(plan['removed'])
+                # An IP coming back after being removed is a flap
+                service_stats['flaps'] += len(removed_before[service_name] & set(plan['added']))
+                removed_before[service_name].update(plan['removed'])
+                dns_records[plan['hostname']] = plan['target']
+
+    return stats, dns_records
+
+
+def print_plan(plans):
+    for service_name, plan in plans.items():
+        print(f"📁 {service_name} ({plan['hostname']})")
+        print(f"   Current DNS IPs: {', '.join(plan['previous']) or 'None'}")
+        print(f"   Target IPs: {', '.join(plan['target']) or 'None'}")
+        if plan['status'] == 'ok':
+            print("   ✅ No changes")
+            continue
+        for ip in plan['removed']:
+            print(f"   ➖ {'Remove' if plan['status'] == 'updated' else 'Would remove (updates disabled)'}: {ip}")
+        for ip in plan['added']:
+            print(f"   ➕ {'Add' if plan['status'] == 'updated' else 'Would add (updates disabled)'}: {ip}")
+        for ip in plan['kept']:
+            print(f"   ⏭️  Keep (not checked): {ip}")
+
+
+def print_replay(stats, run_count):
+    print(f"Replayed {run_count} run(s)\n")
+    print(f"{'Service':<24} {'Runs':>6} {'Updates':>8} {'Added':>6} {'Removed':>8} {'Flaps':>6} {'Empty':>6} {'Mismatch':>9}")
+    for service_name, service_stats in stats.items():
+        print(f"{service_name:<24} {service_stats['runs']:>6} {service_stats['updates']:>8} "
+              f"{service_stats['added']:>6} {service_stats['removed']:>8} {service_stats['flaps']:>6} "
+              f"{service_stats['empty']:>6} {service_stats['mismatches']:>9}")
+
+
+def take_snapshot(config):
+    """Read the current A records of every managed service from Cloudflare"""
+    api_token = os.environ.get('CLOUDFLARE_API_TOKEN')
+    if not api_token:
+        print("ERROR: CLOUDFLARE_API_TOKEN is required for a snapshot", file=sys.stderr)
+        sys.exit(1)
+    headers = {
+        'Authorization': f'Bearer {api_token}',
+        'Content-Type': 'application/json'
+    }
+    snapshot = {}
+    for service in managed_services(config):
+        records = fetch_dns_records(service['cloudflare']['zone_id'], service['hostname'], headers)
+        if records is None:
+            sys.exit(1)
+        snapshot[service['hostname']] = sorted(records)
+    return snapshot
+
+
+def load_snapshot(path):
+    """Load a DNS snapshot: {hostname: [ip, ...]}"""
+    if not path:
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan and replay DNS changes offline")
+    parser.add_argument('--config', default=CONFIG_PATH, help="monitor configuration file")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    plan_parser = subparsers.add_parser('plan', help="show the DNS changes for recorded health results")
+    plan_parser.add_argument('--health', required=True,
+                             help="captured health results, combined stage results or a healthcheck log")
+    plan_parser.add_argument('--dns', help="DNS snapshot ({hostname: [ip, ...]}); empty if omitted")
+    plan_parser.add_argument('--json', action='store_true', help="emit the change set as JSON")
+
+    replay_parser = subparsers.add_parser('replay', help="replay recorded runs through the DNS logic")
+    replay_parser.add_argument('runs', nargs='+', help="healthcheck logs or JSONL files of captured results")
+    replay_parser.add_argument('--dns', help="DNS snapshot to start from; empty if omitted")
+    replay_parser.add_argument('--json', action='store_true', help="emit statistics and final DNS as JSON")
+
+    subparsers.add_parser('snapshot', help="print the current Cloudflare A records as a snapshot")
+
+    args = parser.parse_args()
+    config = load_config_or_exit(args.config)
+
+    if args.command == 'snapshot':
+        print(json.dumps(take_snapshot(config), indent=2))
+    elif args.command == 'plan':
+        runs = load_runs(args.health, config)
+        if not runs:
+            print(f"ERROR: No recorded runs found in {args.health}")
+            sys.exit(1)
+        # Plan against the most recent run
+        plans = plan_run(config, runs[-1]['health_results'], load_snapshot(args.dns))
+        if args.json:
+            print(json.dumps(plans))
+        else:
+            print_plan(plans)
+    else:
+        runs = []
+        for path in args.runs:
+            runs.extend(load_runs(path, config))
+        stats, final_dns = replay(config, runs, load_snapshot(args.dns))
+        if args.json:
+            print(json.dumps({'runs': len(runs), 'services': stats, 'final_dns': final_dns}))
+        else:
+            print_replay(stats, len(runs))
+
+
+if __name__ == "__main__":
+    main()
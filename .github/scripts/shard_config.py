@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Manage config fragments for large fleets.
+
+    shard_config.py split                 # move servers/services into fragment files
+    shard_config.py add-servers fleet.csv # bulk onboard servers (CSV name,ip or JSON list)
+"""
+import os
+import csv
+import sys
+import json
+import argparse
+
+from config_loader import CONFIG_PATH, FRAGMENT_KINDS, ConfigError, fragment_path, is_fragment_name, is_ipv4, load_config
+
+
+def write_json(path, data):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def split_config(config_path, fragment_dir):
+    """Move every server and service from the base file into its own fragment"""
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+
+    # Check every name before writing anything so a bad entry can't leave a half-split config
+    errors = [f"{kind}: invalid name {entry.get('name')!r}"
+              for kind in FRAGMENT_KINDS for entry in config.get(kind, [])
+              if not is_fragment_name(entry.get('name'))]
+    if errors:
+        raise ConfigError(errors)
+
+    for kind in FRAGMENT_KINDS:
+        for entry in config.pop(kind, []):
+            path = fragment_path(kind, entry['name'], fragment_dir)
+            if os.path.exists(path):
+                # An existing fragment already overrides this base entry
+                print(f"   ⏭️  {path} exists, keeping it")
+                continue
+            write_json(path, entry)
+            print(f"   ➕ {path}")
+
+    write_json(config_path, config)
+    print(f"✅ {config_path} now only holds shared settings")
+
+
+def read_servers(path):
+    """Read servers to onboard from a CSV (name,ip) or a JSON list"""
+    with open(path, 'r') as f:
+        if path.endswith('.json'):
+            return json.load(f)
+        return [{'name': row[0].strip(), 'ip': row[1].strip()}
+                for row in csv.reader(f) if row and not row[0].startswith('#') and row[0] != 'name']
+
+
+def add_servers(servers, fragment_dir):
+    """Create or update one fragment per server"""
+    errors = []
+    seen = set()
+    for server in servers:
+        name, ip = server.get('name'), server.get('ip')
+        if not name or name in seen:
+            errors.append(f"missing or duplicate server name: {name!r}")
+        elif not is_fragment_name(name):
+            errors.append(f"invalid server name {name!r} (letters, digits, '.', '_' and '-' only, not starting with '.')")
+        if not isinstance(ip, str) or not is_ipv4(ip):
+            errors.append(f"{name}: invalid IPv4 address {ip!r}")
+        seen.add(name)
+    if errors:
+        raise ConfigError(errors)
+
+    for server in servers:
+        path = fragment_path('servers', server['name'], fragment_dir)
+        entry = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        entry.update(server)
+        write_json(path, entry)
+        print(f"   ➕ {path} ({server['ip']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage HA Monitor config fragments")
+    parser.add_argument('--config', default=CONFIG_PATH, help="base configuration file")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('split', help="move servers and services into fragment files")
+    add_parser = subparsers.add_parser('add-servers', help="create or update server fragments in bulk")
+    add_parser.add_argument('file', help="CSV with name,ip rows or a JSON list of server objects")
+    args = parser.parse_args()
+
+    fragment_dir = os.path.join(os.path.dirname(args.config), 'ha')
+    try:
+        if args.command == 'split':
+            split_config(args.config, fragment_dir)
+        else:
+            add_servers(read_servers(args.file), fragment_dir)
+        config = load_config(args.config, fragment_dir)
+    except ConfigError as e:
+        print(f"ERROR: Invalid configuration:\n{e}")
+        sys.exit(1)
+    print(f"✅ Configuration OK: {len(config['servers'])} servers, {len(config['services'])} services")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+import time
+
+
+IMPORTTIME_PREFIX = 'import time:'
+
+# Number of slowest imports listed per stage
+TOP_IMPORTS = 5
+
+
+def split_importtime(stderr):
+    """Separate `-X importtime` lines from the rest of stderr.
+
+    Returns ([(module, cumulative_us)] for top-level imports, remaining stderr).
+    """
+    imports = []
+    other_lines = []
+    for line in (stderr or '').splitlines():
+        if not line.startswith(IMPORTTIME_PREFIX):
+            other_lines.append(line)
+            continue
+        parts = line[len(IMPORTTIME_PREFIX):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            # Column header line
+            continue
+        name = parts[2]
+        # Nested imports are indented by two extra spaces per level
+        if name.startswith(' ') and not name.startswith('   '):
+            imports.append((name.strip(), int(parts[1])))
+    return imports, '\n'.join(other_lines)
+
+
+class StartupProfile:
+    """Collects per-stage wall time and import time for a profiled run"""
+
+    def __init__(self):
+        self.stages = []
+        self.background = set()
+        self._timers = {}
+        self._created = time.perf_counter()
+
+    def command(self, script):
+        """Interpreter command for a stage script with import timing enabled"""
+        return ['python3', '-X', 'importtime', script]
+
+    def start(self, name, background=False):
+        """Start timing a stage; background stages overlap the others"""
+        if background:
+            self.background.add(name)
+        self._timers[name] = time.perf_counter()
+
+    def stop(self, name, imports=()):
+        wall = time.perf_counter() - self._timers.pop(name)
+        self.stages.append({'stage': name, 'wall': wall, 'imports': list(imports),
+                            'background': name in self.background})
+
+    def record_process(self, name, process):
+        """Stop a stage timer and strip import timing from the process's stderr"""
+        imports = []
+        if process is not None:
+            imports, process.stderr = split_importtime(process.stderr)
+        self.stop(name, imports)
+
+    def report(self):
+        """Print the per-stage breakdown.
+
+        Background stages overlap the others, so the total wall time is the
+        elapsed time of the run rather than the sum of the stages.
+        """
+        print("\n=== Startup Profile ===")
+        print(f"{'Stage':<14} {'Wall':>9} {'Imports':>9}  Slowest imports")
+        total_imports = 0.0
+        for stage in self.stages:
+            import_seconds = sum(us for _, us in stage['imports']) / 1e6
+            slowest = sorted(stage['imports'], key=lambda item: item[1], reverse=True)[:TOP_IMPORTS]
+            slowest_text = ', '.join(f"{name} {us / 1000:.1f}ms" for name, us in slowest)
+            name = f"{stage['stage']}*" if stage['background'] else stage['stage']
+            print(f"{name:<14} {stage['wall'] * 1000:>7.1f}ms {import_seconds * 1000:>7.1f}ms  {slowest_text}")
+            total_imports += import_seconds
+        total_wall = time.perf_counter() - self._created
+        print(f"{'total':<14} {total_wall * 1000:>7.1f}ms {total_imports * 1000:>7.1f}ms")
+        if self.background:
+            print("* ran in the background, overlapping the stages after it")